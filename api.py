@@ -1,90 +1,150 @@
 import os
-import pickle
-from embedder import Embedder
-from reader import read_file_content
+import time
+import numpy as np
+import metrics
+from embedder import get_embedder
 
-from db import insert_documents
+from db import get_ids_for_paths, cache_contents
+from index_store import generation_paths, new_generation, publish_generation, write_path_table, read_path_table, PathTable
+from config import EMBED_BATCH_SIZE, INDEX_COMMIT_SECONDS, INDEX_FIRST_COMMIT_SECONDS
+from index_factory import maybe_rebuild
 import faiss
 
-# 🔍 Configuration
+# 🔍 Configuration (extension / excluded-directory rules live in scanner_fast)
 SCAN_DIRS = ["C:\\", "D:\\"]
-VALID_EXTS = [
-    ".txt", ".pdf", ".docx", ".xlsx", ".xls", ".db",
-    ".js", ".py", ".java", ".cpp", ".c",
-    ".jpg", ".jpeg", ".png", ".bmp", ".webp"
-]
-EXCLUDED_DIRS = [
-    "windows", "program files", "programdata", ".git", ".venv",
-    "appdata", "system volume information", "$recycle.bin",
-    "node_modules", "__pycache__", ".idea", ".vscode",
-    "site-packages", "lib", "dist", "build", ".mypy_cache"
-]
-
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
-
-embedder = Embedder()
-
-# ✅ Check if a path should be excluded
-def should_exclude(path):
-    return any(excl.lower() in path.lower() for excl in EXCLUDED_DIRS)
-
-# ✅ Get category based on folder name
-def get_folder_category(path):
-    parts = path.lower().split(os.sep)
-    for folder in ["downloads", "documents", "desktop", "pictures", "videos", "music"]:
-        if folder in parts:
-            return folder.capitalize()
-    return "Other"
-
-# ✅ Scan files recursively from SCAN_DIRS
-def scan_files():
-    files = {}
-    folder_counts = {}
-    drive_counts = {}
-
-    for root in SCAN_DIRS:
-        drive_counts[root] = 0
-        for dirpath, dirnames, filenames in os.walk(root):
-            dirnames[:] = [d for d in dirnames if not should_exclude(os.path.join(dirpath, d))]
-            for file in filenames:
-                path = os.path.join(dirpath, file)
-                ext = os.path.splitext(file)[1].lower()
-                if ext in VALID_EXTS and os.path.exists(path):
-                    try:
-                        content = read_file_content(path)
-                        files[path] = {
-                            "filename": file,
-                            "path": path,
-                            "extension": ext,
-                            "size": os.path.getsize(path),
-                            "modified": os.path.getmtime(path),
-                            "content": content
-                        }
-
-                        # Folder count
-                        category = get_folder_category(path)
-                        folder_counts[category] = folder_counts.get(category, 0) + 1
-
-                        # Drive count
-                        drive_counts[root] += 1
-                    except:
-                        continue
-
-    return files
-
-# ✅ Create and save FAISS index
-def index_documents(documents: dict):
-    texts = [v["content"] if v["content"] else v["filename"] for v in documents.values()]
-    paths = list(documents.keys())
-
-    vectors = embedder.embed_texts(texts)
-    faiss.normalize_L2(vectors)
-
-    index = faiss.IndexFlatIP(vectors.shape[1])
-    index.add(vectors)
-
-    os.makedirs(os.path.dirname(INDEX_PATH), exist_ok=True)
-    faiss.write_index(index, INDEX_PATH)
-    with open(META_PATH, "wb") as f:
-        pickle.dump(paths, f)
+
+# ✅ Embed a batch of documents; returns normalized float32 vectors aligned with the dict keys
+def embed_documents(documents: dict):
+    paths = list(documents)
+
+    # Cached vectors are reused; identical texts (duplicate files) are embedded once
+    rows = [None] * len(paths)
+    pending = {}
+    for i, p in enumerate(paths):
+        doc = documents[p]
+        if doc.get("vector") is not None:
+            rows[i] = np.frombuffer(doc["vector"], dtype="float32")
+        else:
+            text = doc["content"] if doc["content"] else doc["filename"]
+            pending.setdefault(text, []).append(i)
+
+    if pending:
+        texts = list(pending)
+        with metrics.timed("embed", len(texts)):
+            embedded = np.ascontiguousarray(get_embedder().embed_texts(texts), dtype="float32")
+        faiss.normalize_L2(embedded)
+        cache_rows = {}
+        for text, vector in zip(texts, embedded):
+            for i in pending[text]:
+                rows[i] = vector
+                doc = documents[paths[i]]
+                # Only real, fully extracted text is cached (not previews or the filename fallback)
+                if doc.get("content_hash") and doc["content"] and doc.get("depth", 2) == 2:
+                    cache_rows[doc["content_hash"]] = (doc["content_hash"], doc["content"], vector.tobytes())
+        cache_contents(list(cache_rows.values()))
+
+    return np.ascontiguousarray(np.vstack(rows), dtype="float32")
+
+def _save_index(index, id_to_path: dict):
+    # Written to the side as a new generation; searches keep using the current one
+    version, index_path, folder = new_generation()
+    faiss.write_index(index, index_path)
+    write_path_table(folder, id_to_path)
+
+    # Swap index + metadata in together; in-memory index holders reload on their next query
+    publish_generation(version)
+
+class IndexBuilder:
+    """
+    Accumulates vectors keyed by documents.id into an IndexIDMap2,
+    batch by batch, and publishes the result with save().
+    New indexes start exact (flat); the final save() converts them to the
+    configured/auto-chosen index type once the corpus size is known.
+    """
+
+    def __init__(self, index=None, id_to_path=None):
+        self.index = index
+        self.id_to_path = id_to_path if id_to_path is not None else {}
+        self._last_save = time.monotonic()
+        self._interval = INDEX_FIRST_COMMIT_SECONDS
+        self.dirty = False  # changes not published yet
+
+    def remove(self, ids):
+        ids = [doc_id for doc_id in set(ids) if doc_id in self.id_to_path]
+        if not ids or self.index is None:
+            return
+        try:
+            self.index.remove_ids(np.array(sorted(ids), dtype="int64"))
+        except RuntimeError:
+            # HNSW / re-rank indexes cannot remove in place: dropping the ids from the
+            # metadata hides the vectors, and maybe_rebuild() compacts them later
+            pass
+        for doc_id in ids:
+            self.id_to_path.pop(doc_id, None)
+        self.dirty = True
+
+    def add(self, paths, vectors, replace=False):
+        """Add vectors for paths that have a DB row; replace=True drops their old vectors first."""
+        ids_by_path = get_ids_for_paths(paths)
+        keep = [i for i, p in enumerate(paths) if p in ids_by_path]
+        if not keep:
+            return 0
+        with metrics.timed("index_build", len(keep)):
+            ids = np.array([ids_by_path[paths[i]] for i in keep], dtype="int64")
+            if replace:
+                self.remove(ids.tolist())
+            if self.index is None:
+                self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+            self.index.add_with_ids(np.ascontiguousarray(vectors[keep]), ids)
+            self.id_to_path.update(zip(ids.tolist(), (paths[i] for i in keep)))
+        self.dirty = True
+        return len(keep)
+
+    def save(self, final=True):
+        if self.index is None:
+            return False
+        with metrics.timed("index_save", len(self.id_to_path)):
+            if final:
+                self.index = maybe_rebuild(self.index, self.id_to_path.keys())
+            _save_index(self.index, self.id_to_path)
+        self._last_save = time.monotonic()
+        self.dirty = False
+        return True
+
+    def publish_due(self, every_seconds):
+        """Unpublished changes and no save for every_seconds."""
+        return self.dirty and time.monotonic() - self._last_save >= every_seconds
+
+    def checkpoint(self, every_seconds=INDEX_COMMIT_SECONDS):
+        """
+        Periodic commit during long scans, which also publishes a searchable snapshot.
+        The first one comes after INDEX_FIRST_COMMIT_SECONDS; the interval then doubles up
+        to every_seconds, so early results show up fast while saves stay rare on big indexes.
+        """
+        if time.monotonic() - self._last_save >= min(self._interval, every_seconds):
+            self._interval *= 2
+            return self.save(final=False)
+        return False
+
+# ✅ Create and save FAISS index (vectors keyed by documents.id), embedding in chunks
+def index_documents(documents: dict, batch_size=EMBED_BATCH_SIZE):
+    builder = IndexBuilder()
+    paths = list(documents)
+    for i in range(0, len(paths), batch_size):
+        chunk = {p: documents[p] for p in paths[i:i + batch_size]}
+        builder.add(list(chunk), embed_documents(chunk))
+    builder.save()
+
+# ✅ Load the saved index for in-place updates (None if a full rebuild is needed)
+def load_index_builder():
+    paths = generation_paths()
+    if paths is None:
+        return None
+    index_path, meta_path = paths
+    id_to_path = read_path_table(meta_path)
+    if isinstance(id_to_path, PathTable):
+        id_to_path = id_to_path.to_dict()  # the builder edits it
+    elif not isinstance(id_to_path, dict):
+        # Legacy positional index (list of paths) cannot be updated by id
+        return None
+    return IndexBuilder(faiss.read_index(index_path), id_to_path)
@@ -1,15 +1,19 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-import os, json, pickle, threading, logging, platform, subprocess, sys
+import os, json, threading, logging, platform, subprocess, sys, multiprocessing, time
 from datetime import datetime
 
 os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
-from embedder import Embedder
-from search import search_documents
-from db import init_db, insert_documents, get_all_doc_stats, upsert_document, delete_document
-from api import index_documents, scan_files
-from reader import read_file_content
+import metrics
+from embedder import get_embedder
+from search import search_documents, search_pages, parse_filters, parse_cursors, parse_queries
+from config import DEEPEN_BATCH_SIZE, DEEPEN_SLICE_SECONDS, INDEX_PUBLISH_SECONDS
+from db import (init_db, insert_documents, get_all_doc_stats, upsert_documents, delete_documents, save_dir_state,
+                get_scan_frontier, save_scan_frontier, has_scan_frontier, get_file_counts, recount_file_counts,
+                get_shallow_paths, mark_deepened, prune_content_cache)
+from index_store import index_holder, index_exists
+from scanner_fast import compute_changes, changes_for_paths, ScanFrontier, priority_roots, recent_first
 
 sys.stdout.reconfigure(encoding='utf-8')
 
@@ -18,8 +22,6 @@ if getattr(sys, 'frozen', False):
 else:
     APP_ROOT = os.path.dirname(os.path.abspath(__file__))
 
-INDEX_PATH = os.path.join(APP_ROOT, "Aaryan_store", "index.faiss")
-META_PATH = os.path.join(APP_ROOT, "Aaryan_store", "meta.pkl")
 STATE_FILE = os.path.join(APP_ROOT, "config_state.json")
 LOG_FILE = os.path.join(APP_ROOT, "document_finder.log")
 
@@ -36,10 +38,8 @@ app = Flask(__name__)
 CORS(app)
 
 WATCH_ROOTS = ["C:\\", "D:\\"]
-VALID_EXTS = {".txt", ".pdf", ".docx", ".xlsx", ".xls", ".db", ".js", ".py", ".java", ".cpp", ".c", ".jpg", ".jpeg", ".png", ".bmp", ".webp"}
-EXCLUDED_DIRS = {"windows", "program files", "programdata", ".git", ".venv", "appdata", "system volume information", "$recycle.bin", "node_modules", "_pycache_", ".idea", ".vscode", "site-packages", "lib", "dist", "build", ".mypy_cache"}
 
-embedder = Embedder()
+embedder = get_embedder()  # lazy: the model loads in the background after startup
 STATE_LOCK = threading.Lock()
 STATE = {"termsAccepted": False, "firstTime": True, "job": {"status": "idle", "step": "", "startedAt": None, "endedAt": None, "error": None, "indexed": 0}}
 
@@ -72,109 +72,320 @@ def set_job(status, step="", error=None, indexed=0):
             STATE["job"]["endedAt"] = now
     logging.info(f"Job {status}: {step} (indexed={indexed}) error={error}")
 
-def _allowed_file(path):
-    path_lower = path.lower()
-    if not any(path_lower.endswith(ext) for ext in VALID_EXTS): return False
-    parts = path_lower.split(os.sep)
-    return not any(ex in parts for ex in EXCLUDED_DIRS)
-
-def _stat_walk(roots):
-    out = {}
-    for root in roots:
-        if not os.path.exists(root): continue
-        for dirpath, dirnames, filenames in os.walk(root):
-            dirnames[:] = [d for d in dirnames if not any(ex in os.path.join(dirpath, d).lower() for ex in EXCLUDED_DIRS)]
-            for filename in filenames:
-                file_path = os.path.join(dirpath, filename)
-                if not _allowed_file(file_path): continue
-                try:
-                    stat = os.stat(file_path)
-                    out[file_path] = (stat.st_size, stat.st_mtime)
-                except (FileNotFoundError, PermissionError): continue
-    return out
-
-def _build_docs_for_paths(paths):
-    docs = {}
-    for path in paths:
-        if not os.path.exists(path) or not _allowed_file(path):
-            continue
-        try:
-            logging.info(f"🔍 Processing: {path}")
-            stat = os.stat(path)
-            content = read_file_content(path) or os.path.basename(path)
-            docs[path] = {
-                "filename": os.path.basename(path),
-                "path": path,
-                "extension": os.path.splitext(path)[1].lower(),
-                "size": stat.st_size,
-                "modified": stat.st_mtime,
-                "content": content
-            }
-        except Exception as e:
-            logging.warning(f"⚠️ Skipped file due to error: {e} at path: {path}")
-    return docs
-
-def run_full_scan_bg():
+def claim_job(step):
+    """
+    Mark a job running unless one already is; return whether this caller got it.
+    Every indexing job takes the slot through here, so only one of them loads, edits and
+    publishes the index at a time.
+    """
+    with STATE_LOCK:
+        if STATE["job"]["status"] == "running":
+            return False
+        STATE["job"]["status"] = "running"
+    set_job("running", step)
+    return True
+
+# 🧱 Index builder kept in memory between jobs; only the job holding the slot touches it
+_BUILDER = None
+_PUBLISH_PENDING = False  # watcher changes held back from publishing (see _publish_loop)
+_UNINDEXED = set()  # DB documents missing from the loaded index (changes not published before exit)
+
+def _resident_builder():
+    """The in-memory index builder, loaded from the published index on first use (None if a rebuild is needed)."""
+    global _BUILDER, _UNINDEXED
+    if _BUILDER is None:
+        from api import load_index_builder
+        _BUILDER = load_index_builder()
+        if _BUILDER is not None:
+            _UNINDEXED = set(get_all_doc_stats()) - set(_BUILDER.id_to_path.values())
+    return _BUILDER
+
+def set_job_stages(stages):
+    """
+    Per-stage pipeline throughput shown by the status action (plus embedding tokens/sec),
+    and overall progress: files written per second and an ETA for the files walked so far
+    (final once the walk stage is done).
+    """
+    progress = {}
+    if stages:
+        stages = dict(stages, tokens=embedder.token_stats())
+        walked, written, rate = stages["walk"]["items"], stages["write"]["items"], stages["write"]["perSec"]
+        progress = {
+            "filesPerSec": rate,
+            "remaining": max(walked - written, 0),
+            "etaSeconds": round(max(walked - written, 0) / rate) if rate else None,
+            "etaFinal": stages["walk"]["done"],
+        }
+    with STATE_LOCK:
+        STATE["job"]["stages"] = stages
+        STATE["job"]["progress"] = progress
+
+def _pipeline_writer_for(builder, write_rows, frontier=None):
+    """
+    Sink for pipeline.run_pipeline: DB write, then add the batch vectors to the index builder.
+    The index is committed periodically so long scans keep durable progress; the scan
+    frontier is saved with each commit so an interrupted full scan can resume from it.
+    """
+    def write_batch(batch, vectors):
+        write_rows(batch)
+        builder.add(list(batch), vectors, replace=True)
+        if frontier is not None:
+            frontier.committed(batch)
+        if builder.checkpoint() and frontier is not None:
+            save_scan_frontier(frontier.snapshot())
+    return write_batch
+
+def run_full_scan_bg(claimed=False):
+    """
+    Index everything under SCAN_DIRS, high-value folders and recent files first; partial
+    indexes are published as the scan goes. If a previous full scan was interrupted, resume it:
+    finished directories are not listed again, and files already committed to the DB and
+    the checkpointed index are not re-read.
+    Files are indexed from a cheap preview (first tier); run_deepen_bg follows with full extraction.
+    claimed: the caller already holds the job slot (see claim_job).
+    """
+    if not (claimed or claim_job("init-db")):
+        logging.info("⏸ Full scan skipped: another job is running")
+        return False
     try:
+        # Indexing stack (faiss, extractors) is imported on first use to keep startup fast
+        from api import IndexBuilder, embed_documents, load_index_builder, SCAN_DIRS
+        from pipeline import run_pipeline
+        global _BUILDER
+
+        _BUILDER = None  # replaced by the builder this scan ends with
         set_job("running", "init-db")
         init_db()
+        saved = get_scan_frontier()
+        builder = load_index_builder() if saved else None
+        if builder is None:
+            saved, builder, db_stats = {}, IndexBuilder(), {}
+            save_scan_frontier({})
+        else:
+            db_stats = get_all_doc_stats()
+            logging.info(f"⏯ Resuming full scan ({len(builder.id_to_path)} documents already indexed)")
         set_job("running", "scan-files")
-        docs = scan_files()
-        if not docs:
+        set_job_stages({})
+        frontier = ScanFrontier(saved)
+        indexed_paths = set(builder.id_to_path.values())
+        inserted = 0
+        dirs = {}
+
+        def insert_rows(batch):
+            nonlocal inserted
+            inserted += insert_documents(batch)
+
+        def scan_paths():
+            known_files = {}
+            for path, stat in db_stats.items():
+                known_files.setdefault(os.path.dirname(path), []).append((path,) + tuple(stat))
+            # Documents / Desktop / Downloads first, newest files first
+            roots = priority_roots(SCAN_DIRS)
+            for path, size, mtime in recent_first(frontier.walk(roots, known_files, dirs), roots=roots):
+                if path in indexed_paths and db_stats.get(path) == (size, mtime):
+                    frontier.committed([path])  # committed before the interruption
+                    continue
+                yield path
+
+        # walk -> parallel extract -> batched embed -> DB + index builder
+        run_pipeline(scan_paths(), embed_documents, _pipeline_writer_for(builder, insert_rows, frontier),
+                     on_progress=set_job_stages, preview=True)
+        if builder.index is None:
+            save_scan_frontier({})
             set_job("done", "scan-files", indexed=0)
             return
-        set_job("running", "insert-db")
-        inserted = insert_documents(docs)
         set_job("running", "index-faiss")
-        index_documents(docs)
+        builder.save()
+        _BUILDER = builder
+        prune_content_cache()
+        save_dir_state(dirs)
+        save_scan_frontier({})
         STATE["firstTime"] = False
         save_state()
         set_job("done", "complete", indexed=inserted)
         threading.Thread(target=start_file_watcher, daemon=True).start()
+        threading.Thread(target=run_deepen_bg, daemon=True).start()
     except Exception as e:
         logging.exception("🔴 Full scan crashed")
         set_job("error", "full-scan", error=str(e))
+    return True
+
+_DEEPEN_YIELD = threading.Event()  # set while a user-triggered job waits for deepening to let go
 
-def run_smart_rescan_bg():
+def _run_after_deepen(step, job, **kwargs):
+    """Run a user-triggered job once the deepen slice in progress has wound down."""
+    _DEEPEN_YIELD.set()
+    try:
+        while not claim_job(step):
+            time.sleep(0.5)
+    finally:
+        _DEEPEN_YIELD.clear()
+    job(claimed=True, **kwargs)
+
+def run_deepen_bg():
+    """
+    Second tier: re-extract preview-indexed documents in full, newest first, in slices of
+    DEEPEN_BATCH_SIZE. A slice stops taking new files after DEEPEN_SLICE_SECONDS, or as soon as
+    a user rescan waits for the slot (_DEEPEN_YIELD); the slot is released between slices so
+    watcher changes and user rescans are not held up. Files whose full extraction fails keep
+    their preview. The resident builder is kept across slices and published on the full scan's
+    checkpoint schedule, with a final save once nothing is left.
+    """
+    from api import embed_documents
+    from pipeline import run_pipeline
+
+    deepened = 0
+    try:
+        while True:
+            if _DEEPEN_YIELD.is_set() or not claim_job("deepen"):
+                time.sleep(5)  # another job is running or waiting; deepen after it
+                continue
+            paths = get_shallow_paths(DEEPEN_BATCH_SIZE)
+            builder = _resident_builder()
+            if not paths or builder is None:
+                if builder is not None and builder.dirty:
+                    set_job("running", "index-faiss")
+                    builder.save()
+                prune_content_cache()
+                set_job("done", "deepen", indexed=deepened)
+                return
+            set_job_stages({})
+            deadline, failed = time.monotonic() + DEEPEN_SLICE_SECONDS, []
+            stats = run_pipeline(paths, embed_documents, _pipeline_writer_for(builder, upsert_documents),
+                                 on_progress=set_job_stages, failed=failed,
+                                 until=lambda: _DEEPEN_YIELD.is_set() or time.monotonic() > deadline)
+            # Files gone since the full scan would otherwise stay shallow forever, and so
+            # would the ones that cannot be extracted (they are not retried on every slice)
+            builder.remove(delete_documents([p for p in paths if not os.path.isfile(p)]))
+            unreadable = [p for p in failed if os.path.isfile(p)]
+            if unreadable:
+                logging.warning(f"⚠ Full extraction failed for {len(unreadable)} files; keeping their previews")
+                mark_deepened(unreadable)
+            builder.checkpoint()
+            deepened += stats["write"]["items"]
+            set_job("done", "deepen", indexed=deepened)
+            time.sleep(1)  # let a waiting watcher batch claim the slot first
+    except Exception as e:
+        logging.exception("🔴 Deep indexing failed")
+        set_job("error", "deepen", error=str(e))
+
+def run_smart_rescan_bg(incremental=False, claimed=False):
+    """
+    Diff the filesystem against the DB and apply only the changes.
+    incremental: skip directories whose mtime is unchanged since the last walk (cheap, used by
+    the watcher; misses in-place edits there). The user-triggered rescan lists everything.
+    Return False if another job holds the slot (nothing was done).
+    """
+    if not (claimed or claim_job("compute-changes")):
+        return False
     try:
         set_job("running", "compute-changes")
-        db_stats = get_all_doc_stats()
-        fs_stats = _stat_walk(WATCH_ROOTS)
-
-        new_paths = [p for p in fs_stats if p not in db_stats]
-        modified_paths = [p for p, (size, mtime) in fs_stats.items() if p in db_stats and db_stats[p] != (size, mtime)]
-        deleted_paths = [p for p in db_stats if p not in fs_stats]
-
-        set_job("running", f"apply-deletes({len(deleted_paths)})")
-        for path in deleted_paths:
-            delete_document(path)
-
-        current_paths = ((set(db_stats) - set(deleted_paths)) | set(new_paths) | set(modified_paths))
-
-        set_job("running", f"build-docs({len(current_paths)})")
-        docs = _build_docs_for_paths(current_paths)
-
-        set_job("running", "update-db")
-        for path, meta in docs.items():
-            upsert_document(path, meta["filename"], meta["extension"], meta["size"], meta["modified"], content=meta.get("content", ""))
-
-        set_job("running", f"index-faiss({len(docs)})")
-        index_documents(docs)
-        set_job("done", "smart-rescan", indexed=len(docs))
+        set_job_stages({})
+        init_db()  # idempotent; applies schema migrations to older databases
+        new_paths, modified_paths, deleted_paths, fs_stats, dirs = compute_changes(WATCH_ROOTS, incremental)
+        _resident_builder()  # first load also finds documents an earlier run left unpublished
+
+        if not (new_paths or modified_paths or deleted_paths or _UNINDEXED):
+            save_dir_state(dirs)
+            set_job("done", "smart-rescan", indexed=0)
+            return True
+
+        # The user-triggered rescan publishes right away; watcher reconciles are batched
+        indexed = _apply_changes(set(new_paths) | set(modified_paths), deleted_paths, publish=not incremental)
+        prune_content_cache()  # texts of deleted and since-modified files
+        save_dir_state(dirs)
+        set_job("done", "smart-rescan", indexed=indexed)
     except Exception as e:
         logging.exception("🔴 Smart rescan failed")
         set_job("error", "smart-rescan", error=str(e))
+    return True
+
+def run_path_changes_bg(paths):
+    """
+    Apply coalesced watcher events: only the affected files / folders are looked at.
+    Return False if another job holds the slot (the caller keeps the paths for later).
+    """
+    if not claim_job(f"watch-changes({len(paths)})"):
+        return False
+    try:
+        set_job_stages({})
+        changed_paths, deleted_paths = changes_for_paths(paths)
+        if not (changed_paths or deleted_paths):
+            set_job("done", "watch-changes", indexed=0)
+            return True
+        set_job("done", "watch-changes", indexed=_apply_changes(changed_paths, deleted_paths))
+    except Exception as e:
+        logging.exception("🔴 Applying watched changes failed")
+        set_job("error", "watch-changes", error=str(e))
+    return True
+
+def _apply_changes(changed_paths, deleted_paths, publish=False):
+    """
+    Drop deleted documents, re-read and re-embed changed ones in the resident index builder.
+    The index is published when publish is set or INDEX_PUBLISH_SECONDS have passed since the
+    last publish; otherwise _publish_loop does it, so a stream of small watcher batches costs
+    one save per interval instead of one per batch. Return documents written.
+    """
+    from api import IndexBuilder, embed_documents
+    from pipeline import run_pipeline
+    global _BUILDER, _PUBLISH_PENDING, _UNINDEXED
+
+    set_job("running", f"apply-deletes({len(deleted_paths)})")
+    builder = _resident_builder()
+    deleted_ids = delete_documents(deleted_paths)
+
+    # Only new and modified files are re-read and re-embedded
+    changed_paths = set(changed_paths)
+    if builder is None:
+        # Missing or legacy (non id-mapped) index: rebuild once from every indexed path
+        builder = _BUILDER = IndexBuilder()
+        changed_paths |= set(get_all_doc_stats())
+        publish = True
+    else:
+        builder.remove(deleted_ids)
+        changed_paths |= _UNINDEXED - set(deleted_paths)
+    _UNINDEXED = set()
+
+    set_job("running", f"build-docs({len(changed_paths)})")
+    stats = run_pipeline(sorted(changed_paths), embed_documents, _pipeline_writer_for(builder, upsert_documents), on_progress=set_job_stages)
+
+    if publish or builder.publish_due(INDEX_PUBLISH_SECONDS):
+        set_job("running", f"index-faiss({stats['write']['items']})")
+        builder.save()
+    _PUBLISH_PENDING = builder.dirty
+    return stats["write"]["items"]
+
+def _publish_loop():
+    """Publish watcher changes held back by _apply_changes once the job slot is free."""
+    global _PUBLISH_PENDING
+    while True:
+        time.sleep(5)
+        if not (_PUBLISH_PENDING and _BUILDER is not None and _BUILDER.publish_due(INDEX_PUBLISH_SECONDS)):
+            continue
+        with STATE_LOCK:
+            previous = dict(STATE["job"])
+        if not claim_job("index-faiss"):
+            continue
+        try:
+            if _BUILDER is not None and _BUILDER.dirty:
+                _BUILDER.save()
+            _PUBLISH_PENDING = False
+        except Exception:
+            logging.exception("🔴 Publishing watched changes failed")
+        finally:
+            with STATE_LOCK:
+                STATE["job"] = previous  # the status action keeps showing the last real job
 
 def start_file_watcher():
     try:
         from file_watcher import start_file_watch
         logging.info("🔁 Starting background file watcher...")
-        threading.Thread(target=start_file_watch, daemon=True).start()
+        threading.Thread(target=start_file_watch, args=(WATCH_ROOTS, run_path_changes_bg, run_smart_rescan_bg, STATE, STATE_LOCK), daemon=True).start()
     except Exception as e:
         logging.exception("File watcher failed")
 
 def start_initial_file_watcher_if_needed():
-    if STATE["termsAccepted"] and os.path.exists(INDEX_PATH) and os.path.exists(META_PATH):
+    if STATE["termsAccepted"] and index_exists():
         start_file_watcher()
 
 @app.route("/task", methods=["POST", "OPTIONS"])
@@ -187,8 +398,10 @@ def task():
     if action == "accept":
         STATE["termsAccepted"] = True
         save_state()
-        if STATE["firstTime"] or not (os.path.exists(INDEX_PATH) and os.path.exists(META_PATH)):
-            threading.Thread(target=run_full_scan_bg, daemon=True).start()
+        if STATE["firstTime"] or not index_exists():
+            if not claim_job("init-db"):
+                return jsonify({"ok": False, "message": "Another job running"}), 409
+            threading.Thread(target=run_full_scan_bg, kwargs={"claimed": True}, daemon=True).start()
             return jsonify({"ok": True, "message": "Full scan started"})
         start_file_watcher()
         return jsonify({"ok": True, "message": "Index already exists"})
@@ -200,7 +413,11 @@ def task():
         if not query:
             return jsonify({"ok": False, "error": "No query provided"}), 400
         try:
-            results = search_documents(query, embedder)
+            filters = parse_filters(data.get("filters"))
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        try:
+            results = search_documents(query, embedder, mode=(data.get("mode") or "auto").strip().lower(), filters=filters)
             return jsonify({"ok": True, "results": results})
         except Exception as e:
             logging.exception("Search failed")
@@ -209,13 +426,19 @@ def task():
     elif action == "smart-rescan":
         if not STATE["termsAccepted"]:
             return jsonify({"ok": False, "error": "Terms not accepted"}), 403
-        if STATE["job"]["status"] == "running":
-            return jsonify({"ok": False, "message": "Another job running"}), 409
-        threading.Thread(target=run_smart_rescan_bg, daemon=True).start()
+        if not claim_job("compute-changes"):
+            with STATE_LOCK:
+                deepening = STATE["job"]["step"] == "deepen"
+            if not deepening or _DEEPEN_YIELD.is_set():
+                return jsonify({"ok": False, "message": "Another job running"}), 409
+            # Deepening is background work: it winds its slice down and the rescan runs next
+            threading.Thread(target=_run_after_deepen, args=("compute-changes", run_smart_rescan_bg), daemon=True).start()
+            return jsonify({"ok": True, "message": "Smart rescan queued after the current deepen slice"})
+        threading.Thread(target=run_smart_rescan_bg, kwargs={"claimed": True}, daemon=True).start()
         return jsonify({"ok": True, "message": "Smart rescan started"})
 
     elif action == "status":
-        return jsonify({"ok": True, **STATE, "indexExists": os.path.exists(INDEX_PATH) and os.path.exists(META_PATH)})
+        return jsonify({"ok": True, **STATE, "indexExists": index_exists()})
 
     return jsonify({"ok": False, "error": f"Unknown action: {action}"}), 400
 
@@ -223,32 +446,58 @@ def task():
 # ————— NEW API —————
 @app.route("/count_files", methods=["POST"])
 def count_files():
-    folder_paths = {
-        "Documents": os.path.join(os.path.expanduser("~"), "Documents"),
-        "Downloads": os.path.join(os.path.expanduser("~"), "Downloads"),
-        "Desktop": os.path.join(os.path.expanduser("~"), "Desktop"),
-        "C Drive": "C:\\",
-        "D Drive": "D:\\",
-        "Pictures": os.path.join(os.path.expanduser("~"), "Pictures"),
-        "Others": os.path.join(os.path.expanduser("~"), "AppData\\Local\\Temp")
-    }
-
-    def count_files_in_folder(path):
-        count = 0
-        try:
-            for root, dirs, files in os.walk(path):
-                dirs[:] = [d for d in dirs if not any(ex in os.path.join(root, d).lower() for ex in EXCLUDED_DIRS)]
-                for f in files:
-                    full_path = os.path.join(root, f)
-                    if _allowed_file(full_path):
-                        count += 1
-        except Exception as e:
-            logging.warning(f"⚠ Error walking {path}: {e}")
-        return count
+    """
+    Indexed files per folder card (db.COUNT_FOLDERS), read from counts the DB keeps current.
+    {"recount": true} recomputes them from the documents table in the background.
+    """
+    data = request.get_json(silent=True) or {}
+    if data.get("recount") and not RECOUNT_RUNNING.is_set():
+        RECOUNT_RUNNING.set()
+        threading.Thread(target=_recount_bg, daemon=True).start()
 
-    results = {name: count_files_in_folder(path) for name, path in folder_paths.items()}
+    results, updated_at = get_file_counts()
+    results["updatedAt"] = datetime.fromtimestamp(updated_at).isoformat(timespec="seconds") if updated_at else None
+    results["recounting"] = RECOUNT_RUNNING.is_set()
     return jsonify(results)
 
+RECOUNT_RUNNING = threading.Event()
+
+def _recount_bg():
+    try:
+        init_db()
+        recount_file_counts()
+    except Exception:
+        logging.exception("Folder recount failed")
+    finally:
+        RECOUNT_RUNNING.clear()
+
+@app.route("/search", methods=["POST"])
+def search_batch_endpoint():
+    """
+    Batch search with cursor pagination.
+    {"queries": [...], "mode": "auto", "limit": 20, "filters": {...}}  -> first page of every query
+    {"cursors": [...], "limit": 20}                  -> next page of each cursor
+    Answers {"ok": true, "pages": [{"query", "results", "cursor"}]}; cursor is null on the last page.
+    """
+    if not STATE["termsAccepted"]:
+        return jsonify({"ok": False, "error": "Terms not accepted"}), 403
+    data = request.get_json(silent=True) or {}
+    try:
+        cursors = parse_cursors(data.get("cursors"))
+        queries = parse_queries(data.get("queries")) if cursors is None else []
+        filters = parse_filters(data.get("filters"))
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    if cursors is None and not queries:
+        return jsonify({"ok": False, "error": "No queries provided"}), 400
+    try:
+        pages = search_pages(queries, embedder, limit=data.get("limit", 5),
+                             mode=(data.get("mode") or "auto").strip().lower(), cursors=cursors, filters=filters)
+        return jsonify({"ok": True, "pages": pages})
+    except Exception as e:
+        logging.exception("Batch search failed")
+        return jsonify({"ok": False, "error": str(e)}), 500
+
 
 @app.route("/openfile", methods=["POST"])
 def open_file():
@@ -275,11 +524,27 @@ def open_file():
         return jsonify({"ok": False, "error": str(e)}), 500
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    """Stage timing counters and latency histograms in Prometheus text format."""
+    return metrics.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
+
 @app.route("/", methods=["GET"])
 def root():
-    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
+    return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat(), "modelReady": embedder.is_loaded})
+
+def _warm_up():
+    """Load the embedding model and FAISS index off the request path."""
+    embedder.warm_up()
+    if index_exists():
+        try:
+            index_holder.get()
+        except Exception:
+            logging.exception("FAISS index warm-up failed")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # extraction workers in the frozen (PyInstaller) build
     print(f"\n🚀 Starting Document Finder at {datetime.now().isoformat(timespec='seconds')}")
     print("🚀 Listening on http://127.0.0.1:5005")
     logging.info("Application started")
@@ -289,9 +554,17 @@ if __name__ == "__main__":
         logging.info("🔧 Creating missing database at startup...")
         init_db()
 
-    if not os.path.exists(INDEX_PATH) or not os.path.exists(META_PATH):
+    if STATE["termsAccepted"] and has_scan_frontier():
+        logging.info("⏯ Full scan was interrupted. Resuming...")
+        threading.Thread(target=run_full_scan_bg, daemon=True).start()
+    elif not index_exists():
         logging.info("⚠ FAISS index or meta missing. Rebuilding...")
         threading.Thread(target=run_full_scan_bg, daemon=True).start()
+    elif STATE["termsAccepted"] and get_shallow_paths(1):
+        logging.info("🔬 Preview-indexed documents left. Deepening...")
+        threading.Thread(target=run_deepen_bg, daemon=True).start()
 
     start_initial_file_watcher_if_needed()
+    threading.Thread(target=_publish_loop, daemon=True).start()
+    threading.Thread(target=_warm_up, daemon=True).start()
     app.run(port=5005)
@@ -0,0 +1,271 @@
+# benchmark.py
+"""
+Reproducible benchmark over a seeded synthetic corpus.
+
+    python benchmark.py --files 2000 --seed 7 --out bench_results.json
+    python benchmark.py --compare old.json new.json
+
+Everything (corpus, database, FAISS store) lives in a scratch directory, so the
+user's index is never touched. Results are JSON, one file per run, tagged with the
+git commit so runs can be compared across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_MIX = "txt:30,py:15,docx:15,xlsx:10,pdf:20,png:10"
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "pa", "zu", "re", "no", "ti", "ga", "be"]
+
+# ---------- CORPUS ----------
+
+def _vocabulary(rng, size=2000):
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(words)
+
+def _lines(rng, vocab, words, per_line=12):
+    picked = [rng.choice(vocab) for _ in range(words)]
+    return [" ".join(picked[i:i + per_line]) for i in range(0, len(picked), per_line)]
+
+def _write_pdf(path, lines, lines_per_page=48):
+    """Minimal text PDF (Helvetica, one content stream per page); no PDF library needed."""
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)] or [[]]
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in pages:
+        body = " ".join("(" + l.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ") '" for l in page)
+        stream = f"BT /F1 11 Tf 14 TL 50 770 Td {body} ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out, offsets = b"%PDF-1.4\n", []
+    for i, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def _write_file(path, kind, lines, rng):
+    if kind == "txt":
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    elif kind == "py":
+        with open(path, "w", encoding="utf-8") as f:
+            for i, line in enumerate(lines):
+                words = line.split()
+                f.write(f"def {words[0]}_{i}({', '.join(words[1:3])}):\n    # {line}\n    return {len(words)}\n\n")
+    elif kind == "docx":
+        from docx import Document
+        doc = Document()
+        for line in lines:
+            doc.add_paragraph(line)
+        doc.save(path)
+    elif kind == "xlsx":
+        import openpyxl
+        wb = openpyxl.Workbook()
+        sheet = wb.active
+        for line in lines:
+            sheet.append(line.split() + [rng.randint(0, 10_000)])
+        wb.save(path)
+    elif kind == "pdf":
+        _write_pdf(path, lines)
+    elif kind == "png":
+        from PIL import Image, ImageDraw
+        shown = lines[:20]
+        img = Image.new("RGB", (900, 20 + 18 * len(shown)), "white")
+        draw = ImageDraw.Draw(img)
+        for i, line in enumerate(shown):
+            draw.text((10, 10 + 18 * i), line, fill="black")
+        img.save(path)
+
+def generate_corpus(root, files=500, seed=0, mix=DEFAULT_MIX, words=300, fanout=8):
+    """
+    Write `files` documents under root, deterministic for a given seed.
+    mix: "ext:weight,..."; words: mean words per document; fanout: subfolders per level (2 levels).
+    Return (vocabulary, {kind: count}).
+    """
+    rng = random.Random(seed)
+    vocab = _vocabulary(rng)
+    kinds, weights = zip(*((k, int(w)) for k, w in (part.split(":") for part in mix.split(","))))
+    counts = {}
+    for i in range(files):
+        kind = rng.choices(kinds, weights)[0]
+        folder = os.path.join(root, f"dir_{rng.randrange(fanout)}", f"sub_{rng.randrange(fanout)}")
+        os.makedirs(folder, exist_ok=True)
+        lines = _lines(rng, vocab, max(10, int(rng.expovariate(1 / words))))
+        _write_file(os.path.join(folder, f"{lines[0].split()[0]}_{i}.{kind}"), kind, lines, rng)
+        counts[kind] = counts.get(kind, 0) + 1
+    return vocab, counts
+
+# ---------- MEASUREMENT ----------
+
+def percentiles(samples):
+    """Summary of timings in milliseconds."""
+    if not samples:
+        return {}
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50), 3),
+        "p95_ms": round(pick(0.95), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def run(args):
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="docfinder_bench_"))
+    corpus = os.path.join(workdir, "corpus")
+    os.makedirs(workdir, exist_ok=True)
+    # DB and index paths are relative to the working directory: keep them in the scratch dir
+    os.chdir(workdir)
+    skip = set(filter(None, args.skip.split(",")))
+    results = {}
+
+    if not os.path.isdir(corpus):
+        print(f"🧪 Generating {args.files} files in {corpus} (seed={args.seed})")
+        (vocab, counts), seconds = _timed(generate_corpus, corpus, args.files, args.seed, args.mix, args.words)
+        results["generate"] = {"seconds": round(seconds, 3), "files": counts}
+    else:
+        vocab = _vocabulary(random.Random(args.seed))
+
+    from db import init_db, insert_documents
+    from scanner_fast import stat_walk, compute_changes
+    from reader import read_file_content
+    init_db()
+
+    # 1️⃣ Walk
+    walks = [_timed(stat_walk, [corpus])[1] for _ in range(args.repeat)]
+    fs_stats = stat_walk([corpus])
+    results["stat_walk"] = dict(percentiles(walks), files=len(fs_stats))
+
+    # 2️⃣ Extraction, by type
+    by_ext, documents = {}, {}
+    for path, (size, mtime) in sorted(fs_stats.items()):
+        content, seconds = _timed(read_file_content, path)
+        ext = os.path.splitext(path)[1].lower()
+        by_ext.setdefault(ext, []).append(seconds)
+        documents[path] = {"filename": os.path.basename(path), "path": path, "extension": ext,
+                           "size": size, "modified": mtime, "content": content}
+    results["read_file_content"] = {
+        ext: dict(percentiles(samples), files_per_sec=round(len(samples) / sum(samples), 1))
+        for ext, samples in sorted(by_ext.items())
+    }
+
+    # 3️⃣ DB write, then change detection against it
+    _, seconds = _timed(insert_documents, documents)
+    results["insert_documents"] = {"seconds": round(seconds, 3), "rows_per_sec": round(len(documents) / seconds, 1)}
+    changes = [_timed(compute_changes, [corpus])[1] for _ in range(args.repeat)]
+    results["compute_changes"] = percentiles(changes)
+
+    # 4️⃣ Embedding and index build
+    if "embed" not in skip:
+        from embedder import get_embedder
+        embedder = get_embedder()
+        texts = [doc["content"] or doc["filename"] for doc in documents.values()]
+        embedder.embed_texts(texts[:8])  # model load outside the timing
+        _, seconds = _timed(embedder.embed_texts, texts)
+        results["embed_texts"] = {"seconds": round(seconds, 3), "docs_per_sec": round(len(texts) / seconds, 1),
+                                  "tokens": embedder.token_stats()}
+    if "index" not in skip and "embed" not in skip:
+        from api import index_documents
+        _, seconds = _timed(index_documents, documents)
+        results["index_documents"] = {"seconds": round(seconds, 3), "docs_per_sec": round(len(documents) / seconds, 1)}
+
+    # 5️⃣ Search latency per mode
+    if "search" not in skip:
+        from search import search_documents
+        rng = random.Random(args.seed + 1)
+        queries = [" ".join(rng.choice(vocab) for _ in range(rng.randint(1, 4))) for _ in range(args.queries)]
+        modes = ["keyword"] if "embed" in skip else ["auto", "keyword", "semantic", "hybrid"]
+        embedder = None if "embed" in skip else get_embedder()
+        results["search_documents"] = {
+            mode: percentiles([_timed(search_documents, q, embedder, 10, mode)[1] for q in queries])
+            for mode in modes
+        }
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "results": results,
+    }
+    if not args.keep and not args.workdir:
+        os.chdir(os.path.dirname(workdir))
+        shutil.rmtree(workdir, ignore_errors=True)
+    return report
+
+def _flatten(tree, prefix=""):
+    flat = {}
+    for key, value in tree.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[prefix + key] = value
+    return flat
+
+def compare(old, new):
+    """Print every numeric result of two runs side by side with the new/old ratio."""
+    a, b = _flatten(old["results"]), _flatten(new["results"])
+    print(f"{'metric':<48}{'old':>12}{'new':>12}{'ratio':>8}")
+    for key in sorted(set(a) & set(b)):
+        ratio = f"{b[key] / a[key]:.2f}" if a[key] else "-"
+        print(f"{key:<48}{a[key]:>12}{b[key]:>12}{ratio:>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="DocFinder benchmark over a synthetic corpus")
+    parser.add_argument("--files", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="ext:weight list, e.g. " + DEFAULT_MIX)
+    parser.add_argument("--words", type=int, default=300, help="mean words per document")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3, help="repetitions of the walk timings")
+    parser.add_argument("--skip", default="", help="comma list of: embed, index, search")
+    parser.add_argument("--workdir", help="reuse / keep a scratch directory (corpus is generated once)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary scratch directory")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"))
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f_old, open(args.compare[1]) as f_new:
+            compare(json.load(f_old), json.load(f_new))
+        sys.exit(0)
+
+    out = os.path.abspath(args.out)
+    report = run(args)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report["results"], indent=2))
+    print(f"📄 Results written to {out}")
@@ -0,0 +1,35 @@
+import os
+
+# ⚙️ Tunables, overridable through DOCFINDER_* environment variables
+
+def _env_int(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+# 🏭 Extraction / embedding pipeline
+EXTRACT_WORKERS = _env_int("DOCFINDER_EXTRACT_WORKERS", max(1, (os.cpu_count() or 2) - 1))
+EMBED_BATCH_SIZE = _env_int("DOCFINDER_EMBED_BATCH_SIZE", 64)
+EMBED_TOKEN_BUDGET = _env_int("DOCFINDER_EMBED_TOKEN_BUDGET", 16384)  # padded tokens per forward pass (batch x longest text)
+PIPELINE_QUEUE_SIZE = _env_int("DOCFINDER_QUEUE_SIZE", 256)
+WALK_WORKERS = _env_int("DOCFINDER_WALK_WORKERS", 8)  # threads listing directories in parallel
+
+# 💾 Full scan: publish the partially built index at most this often while scanning
+INDEX_COMMIT_SECONDS = _env_int("DOCFINDER_INDEX_COMMIT_SECONDS", 300)
+INDEX_FIRST_COMMIT_SECONDS = _env_int("DOCFINDER_INDEX_FIRST_COMMIT_SECONDS", 30)  # first publish; the interval then doubles
+# 👀 Watcher changes are applied to the in-memory index right away, published at most this often
+INDEX_PUBLISH_SECONDS = _env_int("DOCFINDER_INDEX_PUBLISH_SECONDS", 30)
+
+# 🔬 Two-tier indexing: full scans index previews, then files are deepened in slices of this many
+DEEPEN_BATCH_SIZE = _env_int("DOCFINDER_DEEPEN_BATCH_SIZE", 500)
+DEEPEN_SLICE_SECONDS = _env_int("DOCFINDER_DEEPEN_SLICE_SECONDS", 30)  # a slice takes no new files after this
+
+# 🧭 Vector index type: auto | flat | ivf | ivfsq | ivfpq | hnsw (auto picks from corpus size)
+INDEX_TYPE = os.environ.get("DOCFINDER_INDEX_TYPE", "auto").strip().lower()
+INDEX_RERANK_K_FACTOR = _env_int("DOCFINDER_INDEX_RERANK", 0)  # >0: exact re-rank of k * factor candidates
+IVF_NPROBE = _env_int("DOCFINDER_IVF_NPROBE", 16)
+HNSW_EF_SEARCH = _env_int("DOCFINDER_HNSW_EF_SEARCH", 64)
+
+# 🧠 Embedding inference backend: torch (reference) | int8 (dynamic quantization) | onnx
+EMBED_BACKEND = os.environ.get("DOCFINDER_EMBED_BACKEND", "torch").strip().lower()
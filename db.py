@@ -1,11 +1,91 @@
 import sqlite3
 import os
+import queue
+import threading
+from contextlib import contextmanager
+
+import metrics
 
 DB_PATH = "Aaryan_database.db"
+READ_POOL_SIZE = 4
+
+# Folder cards of the UI (result.js): indexed documents below each are counted by triggers
+COUNT_FOLDERS = {
+    "Documents": os.path.join(os.path.expanduser("~"), "Documents"),
+    "Downloads": os.path.join(os.path.expanduser("~"), "Downloads"),
+    "Desktop": os.path.join(os.path.expanduser("~"), "Desktop"),
+    "C Drive": "C:\\",
+    "D Drive": "D:\\",
+    "Pictures": os.path.join(os.path.expanduser("~"), "Pictures"),
+    "Others": os.path.join(os.path.expanduser("~"), "AppData\\Local\\Temp")
+}
+FOLDER_CATEGORIES = ["downloads", "documents", "desktop", "pictures", "videos", "music"]
+
+# ✅ Get category based on folder name (stored in documents.folder for search filters)
+def get_folder_category(path):
+    parts = path.lower().split(os.sep)
+    for folder in FOLDER_CATEGORIES:
+        if folder in parts:
+            return folder.capitalize()
+    return "Other"
+
+# ---------- CONNECTIONS ----------
+# One long-lived writer connection (WAL) serialized by a lock, plus a small pool of
+# reader connections. WAL lets searches read while a scan is writing.
+
+_WRITE_LOCK = threading.RLock()
+_writer = None
+_read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+_owner_pid = os.getpid()
+_name_index = None  # cached has_name_index() result
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+def _reset_after_fork():
+    """Connections must not cross a fork (extraction workers); start fresh in the child."""
+    global _writer, _read_pool, _owner_pid
+    if os.getpid() != _owner_pid:
+        _writer = None
+        _read_pool = queue.LifoQueue(maxsize=READ_POOL_SIZE)
+        _owner_pid = os.getpid()
+
+@contextmanager
+def write_transaction():
+    """Run the block in one transaction on the shared writer connection (commit or rollback)."""
+    global _writer
+    _reset_after_fork()
+    with _WRITE_LOCK:
+        if _writer is None:
+            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True) if os.path.dirname(DB_PATH) else None
+            _writer = _connect()
+            _writer.execute("PRAGMA journal_mode=WAL")
+        with _writer:
+            yield _writer
+
+@contextmanager
+def read_connection():
+    """Borrow a pooled read-only connection."""
+    _reset_after_fork()
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
+        conn.execute("PRAGMA query_only=ON")
+    try:
+        yield conn
+    finally:
+        try:
+            _read_pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
 
 def init_db():
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True) if os.path.dirname(DB_PATH) else None
-    with sqlite3.connect(DB_PATH) as conn:
+    global _name_index
+    _name_index = None
+    with write_transaction() as conn:
         conn.execute('''
             CREATE TABLE IF NOT EXISTS documents (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -13,44 +93,199 @@ def init_db():
                 path TEXT UNIQUE,
                 extension TEXT,
                 size INTEGER,
-                modified REAL
+                modified REAL,
+                content_hash TEXT,
+                depth INTEGER DEFAULT 2,
+                folder TEXT
             )
         ''')
+        # Databases created before the content cache / two-tier indexing / search filters lack these columns
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        if "content_hash" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN content_hash TEXT")
+        if "depth" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN depth INTEGER DEFAULT 2")
+        if "folder" not in columns:
+            conn.execute("ALTER TABLE documents ADD COLUMN folder TEXT")
+            conn.create_function("folder_category", 1, get_folder_category, deterministic=True)
+            conn.execute("UPDATE documents SET folder = folder_category(path)")
+        # Search filters (extension / folder category, then modified range)
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_ext ON documents(extension, modified)")
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_folder ON documents(folder, modified)")
+        # depth 1 = indexed from a preview, waiting for the full extraction (newest first)
+        conn.execute("CREATE INDEX IF NOT EXISTS documents_shallow ON documents(modified) WHERE depth < 2")
         conn.execute('''
             CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
                 filename, path, content
             )
         ''')
+        # Extracted text and its (normalized float32) vector, keyed by content hash
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS content_cache (
+                hash TEXT PRIMARY KEY,
+                content TEXT,
+                vector BLOB
+            )
+        ''')
+        # Directory mtimes from the last completed walk (lets rescans skip unchanged directories)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS dir_state (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime REAL
+            )
+        ''')
+        # Directories walked by a running full scan (mtime NULL = not finished), for resuming it
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS scan_frontier (
+                path TEXT PRIMARY KEY,
+                parent TEXT,
+                mtime REAL
+            )
+        ''')
 
-def insert_documents(docs: dict):
-    with sqlite3.connect(DB_PATH) as conn:
-        inserted = 0
-        for path, meta in docs.items():
+        # Per-folder document counts, kept current by triggers on every insert / delete
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS file_counts (
+                name TEXT PRIMARY KEY,
+                prefix TEXT,
+                count INTEGER DEFAULT 0,
+                updated_at REAL
+            )
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_count_insert AFTER INSERT ON documents BEGIN
+                UPDATE file_counts SET count = count + 1, updated_at = strftime('%s', 'now')
+                WHERE substr(NEW.path, 1, length(prefix)) = prefix;
+            END
+        ''')
+        conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS documents_count_delete AFTER DELETE ON documents BEGIN
+                UPDATE file_counts SET count = count - 1, updated_at = strftime('%s', 'now')
+                WHERE substr(OLD.path, 1, length(prefix)) = prefix;
+            END
+        ''')
+        _sync_count_folders(conn)
+
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version < 1:
+            # FTS rows are keyed by documents.id (rowid) so batch updates/deletes are
+            # rowid lookups instead of full FTS scans; also drops duplicate FTS rows,
+            # keeping the most recently written (highest rowid) one of each path.
+            conn.execute("CREATE TEMP TABLE fts_old AS SELECT rowid AS old_rowid, filename, path, content FROM documents_fts")
+            conn.execute("DELETE FROM documents_fts")
+            conn.execute('''
+                INSERT INTO documents_fts (rowid, filename, path, content)
+                SELECT d.id, o.filename, o.path, o.content
+                FROM fts_old o
+                JOIN (SELECT MAX(old_rowid) AS old_rowid FROM fts_old GROUP BY path) latest USING (old_rowid)
+                JOIN documents d ON d.path = o.path
+            ''')
+            conn.execute("DROP TABLE fts_old")
+            conn.execute("PRAGMA user_version = 1")
+            version = 1
+
+        if version < 2:
+            # Trigram index over filenames (rowid = documents.id) for indexed substring search
             try:
-                conn.execute('''
-                    INSERT OR REPLACE INTO documents
-                    (filename, path, extension, size, modified)
-                    VALUES (?, ?, ?, ?, ?)
-                ''', (
-                    meta["filename"], path,
-                    meta["extension"], meta["size"], meta["modified"]
-                ))
-                conn.execute('''
-                    INSERT INTO documents_fts (filename, path, content)
-                    VALUES (?, ?, ?)
-                ''', (
-                    meta["filename"], path, meta.get("content", "")
-                ))
-                inserted += 1
-            except Exception as e:
-                print(f"[DB ERROR] {e}")
-        conn.commit()
-    return inserted
+                conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS documents_name USING fts5(filename, tokenize='trigram')")
+            except sqlite3.OperationalError as e:
+                print(f"[DB WARNING] Trigram filename index unavailable (SQLite {sqlite3.sqlite_version}): {e}")
+            else:
+                conn.execute("DELETE FROM documents_name")
+                conn.execute("INSERT INTO documents_name (rowid, filename) SELECT id, filename FROM documents")
+                conn.execute("PRAGMA user_version = 2")
+
+def _sync_count_folders(conn, recount=False):
+    """Make file_counts match COUNT_FOLDERS; new or moved folders (or all, on recount) are counted from documents."""
+    rows = {row[0]: row[1] for row in conn.execute("SELECT name, prefix FROM file_counts")}
+    conn.executemany("DELETE FROM file_counts WHERE name = ?", [(name,) for name in rows if name not in COUNT_FOLDERS])
+    for name, folder in COUNT_FOLDERS.items():
+        prefix = os.path.join(folder, "")
+        if recount or rows.get(name) != prefix:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM documents WHERE substr(path, 1, length(?)) = ?", (prefix, prefix)
+            ).fetchone()[0]
+            conn.execute("""
+                INSERT INTO file_counts (name, prefix, count, updated_at) VALUES (?, ?, ?, strftime('%s', 'now'))
+                ON CONFLICT(name) DO UPDATE SET
+                    prefix=excluded.prefix,
+                    count=excluded.count,
+                    updated_at=excluded.updated_at
+            """, (name, prefix, count))
+
+def has_name_index(conn):
+    """True if the trigram filename index exists (needs SQLite >= 3.34)."""
+    global _name_index
+    if _name_index is None:
+        _name_index = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'documents_name'"
+        ).fetchone() is not None
+    return _name_index
+
+def _ids_for_paths(conn, paths):
+    paths = list(paths)
+    ids = {}
+    # Chunked to stay under SQLite's bound-parameter limit
+    for i in range(0, len(paths), 500):
+        chunk = paths[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        cur = conn.execute(f"SELECT path, id FROM documents WHERE path IN ({placeholders})", chunk)
+        ids.update({row[0]: row[1] for row in cur.fetchall()})
+    return ids
+
+def _write_documents(conn, docs: dict, with_fts=True):
+    conn.executemany("""
+        INSERT INTO documents (filename, path, extension, size, modified, content_hash, depth, folder)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(path) DO UPDATE SET
+            filename=excluded.filename,
+            extension=excluded.extension,
+            size=excluded.size,
+            modified=excluded.modified,
+            content_hash=excluded.content_hash,
+            depth=excluded.depth,
+            folder=excluded.folder
+    """, [
+        (meta["filename"], path, meta["extension"], meta["size"], meta["modified"], meta.get("content_hash"),
+         meta.get("depth", 2), get_folder_category(path))
+        for path, meta in docs.items()
+    ])
+    ids = _ids_for_paths(conn, docs)
+    if has_name_index(conn):
+        conn.executemany("DELETE FROM documents_name WHERE rowid = ?", [(doc_id,) for doc_id in ids.values()])
+        conn.executemany("INSERT INTO documents_name (rowid, filename) VALUES (?, ?)", [
+            (ids[path], meta["filename"]) for path, meta in docs.items() if path in ids
+        ])
+    if with_fts:
+        conn.executemany("DELETE FROM documents_fts WHERE rowid = ?", [(doc_id,) for doc_id in ids.values()])
+        conn.executemany("""
+            INSERT INTO documents_fts (rowid, filename, path, content)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (ids[path], meta["filename"], path, meta.get("content") or "")
+            for path, meta in docs.items() if path in ids
+        ])
+
+def upsert_documents(docs: dict):
+    """Insert or update many documents and their FTS rows in a single transaction."""
+    if not docs:
+        return 0
+    with metrics.timed("db_write", len(docs)), write_transaction() as conn:
+        _write_documents(conn, docs)
+    return len(docs)
+
+def insert_documents(docs: dict):
+    try:
+        return upsert_documents(docs)
+    except sqlite3.Error as e:
+        print(f"[DB ERROR] {e}")
+        return 0
 
 # ✅ Helper to get extension (filetype) from DB using path
 def get_filetype_by_path(path):
     try:
-        with sqlite3.connect(DB_PATH) as conn:
+        with read_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT extension FROM documents WHERE path = ?", (path,))
             row = cursor.fetchone()
@@ -63,35 +298,179 @@ def get_filetype_by_path(path):
 
 def get_all_doc_stats():
     """Return {path: (size, modified)} from the documents table."""
-    with sqlite3.connect(DB_PATH) as conn:
+    with read_connection() as conn:
         cur = conn.execute("SELECT path, size, modified FROM documents")
         return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
 
-def upsert_document(path, filename, ext, size, modified, content=None):
+def get_doc_stats(paths):
+    """Return {path: (size, modified)} for the given paths that are indexed."""
+    paths = list(paths)
+    stats = {}
+    with read_connection() as conn:
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cur = conn.execute(f"SELECT path, size, modified FROM documents WHERE path IN ({placeholders})", chunk)
+            stats.update({row[0]: (row[1], row[2]) for row in cur.fetchall()})
+    return stats
+
+def get_documents_by_ids(ids):
+    """Return {id: (filename, path, modified, extension)} for the given document ids that exist."""
+    ids = list(ids)
+    rows = {}
+    with read_connection() as conn:
+        for i in range(0, len(ids), 500):
+            chunk = ids[i:i + 500]
+            placeholders = ",".join("?" * len(chunk))
+            cur = conn.execute(f"SELECT id, filename, path, modified, extension FROM documents WHERE id IN ({placeholders})", chunk)
+            rows.update({row[0]: row[1:] for row in cur.fetchall()})
+    return rows
+
+def get_doc_stats_under(folder):
+    """Return {path: (size, modified)} for every indexed document below a folder (path index range scan)."""
+    prefix = folder.rstrip(os.sep) + os.sep
+    upper = prefix[:-1] + chr(ord(os.sep) + 1)
+    with read_connection() as conn:
+        cur = conn.execute("SELECT path, size, modified FROM documents WHERE path >= ? AND path < ?", (prefix, upper))
+        return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+def get_shallow_paths(limit):
+    """Newest documents indexed from a preview only (first tier), up to limit."""
+    with read_connection() as conn:
+        cur = conn.execute("SELECT path FROM documents WHERE depth < 2 ORDER BY modified DESC LIMIT ?", (limit,))
+        return [row[0] for row in cur.fetchall()]
+
+def mark_deepened(paths):
+    """Stop deepening documents whose full extraction failed: they keep their preview text at depth 2."""
+    paths = list(paths)
+    with write_transaction() as conn:
+        for i in range(0, len(paths), 500):
+            chunk = paths[i:i + 500]
+            conn.execute(f"UPDATE documents SET depth = 2 WHERE path IN ({','.join('?' * len(chunk))})", chunk)
+
+def get_ids_for_paths(paths):
+    """Return {path: documents.id} for the given paths (missing paths are left out)."""
+    with read_connection() as conn:
+        return _ids_for_paths(conn, paths)
+
+def upsert_document(path, filename, ext, size, modified, content=None, content_hash=None):
     """Insert or update a single document row (+ FTS if content provided)."""
-    with sqlite3.connect(DB_PATH) as conn:
-        conn.execute("""
-            INSERT INTO documents (filename, path, extension, size, modified)
-            VALUES (?, ?, ?, ?, ?)
-            ON CONFLICT(path) DO UPDATE SET
-                filename=excluded.filename,
-                extension=excluded.extension,
-                size=excluded.size,
-                modified=excluded.modified
-        """, (filename, path, ext, size, modified))
-        if content is not None:
-            # Replace FTS content for this path (delete then insert)
-            conn.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
-            conn.execute("""
-                INSERT INTO documents_fts (filename, path, content)
-                VALUES (?, ?, ?)
-            """, (filename, path, content))
-        conn.commit()
+    doc = {"filename": filename, "extension": ext, "size": size, "modified": modified,
+           "content": content, "content_hash": content_hash}
+    with write_transaction() as conn:
+        _write_documents(conn, {path: doc}, with_fts=content is not None)
+
+def delete_documents(paths):
+    """Delete many documents and their FTS rows in one transaction. Return the deleted ids."""
+    paths = list(paths)
+    if not paths:
+        return []
+    with write_transaction() as conn:
+        ids = list(_ids_for_paths(conn, paths).values())
+        # Delete FTS first (no ON DELETE CASCADE on virtual table)
+        conn.executemany("DELETE FROM documents_fts WHERE rowid = ?", [(doc_id,) for doc_id in ids])
+        if has_name_index(conn):
+            conn.executemany("DELETE FROM documents_name WHERE rowid = ?", [(doc_id,) for doc_id in ids])
+        conn.executemany("DELETE FROM documents WHERE id = ?", [(doc_id,) for doc_id in ids])
+    return ids
 
 def delete_document(path):
     """Delete a document and its FTS row by exact path."""
-    with sqlite3.connect(DB_PATH) as conn:
-        # Delete FTS first (no ON DELETE CASCADE on virtual table)
-        conn.execute("DELETE FROM documents_fts WHERE path = ?", (path,))
-        conn.execute("DELETE FROM documents WHERE path = ?", (path,))
-        conn.commit()
\ No newline at end of file
+    delete_documents([path])
+
+# ---------- DIRECTORY STATE ----------
+
+def _load_dirs(table):
+    try:
+        with read_connection() as conn:
+            return {row[0]: (row[1], row[2]) for row in conn.execute(f"SELECT path, parent, mtime FROM {table}")}
+    except sqlite3.Error as e:
+        print(f"[DB ERROR] {table} unavailable: {e}")
+        return {}
+
+def _save_dirs(table, dirs):
+    with write_transaction() as conn:
+        conn.execute(f"DELETE FROM {table}")
+        conn.executemany(f"INSERT INTO {table} (path, parent, mtime) VALUES (?, ?, ?)", [
+            (path, parent, mtime) for path, (parent, mtime) in dirs.items()
+        ])
+
+def get_dir_state():
+    """Return {dir: (parent, mtime)} saved by the last completed walk ({} if none)."""
+    return _load_dirs("dir_state")
+
+def save_dir_state(dirs: dict):
+    """Replace the saved directory state with {dir: (parent, mtime)}."""
+    _save_dirs("dir_state", dirs)
+
+def get_scan_frontier():
+    """Return the frontier {dir: (parent, mtime or None)} of an interrupted full scan ({} if none)."""
+    return _load_dirs("scan_frontier")
+
+def save_scan_frontier(dirs: dict):
+    """Replace the saved full-scan frontier; {} marks the scan as finished."""
+    _save_dirs("scan_frontier", dirs)
+
+def has_scan_frontier():
+    """True if a full scan was interrupted and can be resumed."""
+    try:
+        with read_connection() as conn:
+            return conn.execute("SELECT 1 FROM scan_frontier LIMIT 1").fetchone() is not None
+    except sqlite3.Error:
+        return False  # database not initialized yet
+
+# ---------- CONTENT-HASH CACHE ----------
+
+def get_cached_content(content_hash):
+    """Return (content, vector_bytes or None) for a content hash, or None if never seen."""
+    if not content_hash:
+        return None
+    try:
+        with read_connection() as conn:
+            row = conn.execute("SELECT content, vector FROM content_cache WHERE hash = ?", (content_hash,)).fetchone()
+            return (row[0], row[1]) if row else None
+    except sqlite3.Error as e:
+        # The cache is best-effort (extraction workers read it while the writer commits)
+        print(f"[DB ERROR] Content cache lookup failed: {e}")
+        return None
+
+def cache_contents(rows):
+    """Store [(content_hash, content, vector_bytes)] in the content cache."""
+    if not rows:
+        return
+    with write_transaction() as conn:
+        conn.executemany("""
+            INSERT INTO content_cache (hash, content, vector) VALUES (?, ?, ?)
+            ON CONFLICT(hash) DO UPDATE SET
+                content=excluded.content,
+                vector=excluded.vector
+        """, rows)
+
+def prune_content_cache():
+    """Drop cached contents no document references any more; return how many were removed."""
+    with write_transaction() as conn:
+        return conn.execute("""
+            DELETE FROM content_cache WHERE hash NOT IN (
+                SELECT content_hash FROM documents WHERE content_hash IS NOT NULL
+            )
+        """).rowcount
+
+# ---------- FOLDER COUNTS ----------
+
+def get_file_counts():
+    """Return ({card name: indexed documents}, last update as unix time or None); no disk access."""
+    try:
+        with read_connection() as conn:
+            rows = conn.execute("SELECT name, count, updated_at FROM file_counts").fetchall()
+    except sqlite3.Error as e:
+        print(f"[DB ERROR] Folder counts unavailable: {e}")
+        rows = []
+    counts = {name: 0 for name in COUNT_FOLDERS}
+    counts.update({row[0]: row[1] for row in rows if row[0] in counts})
+    updated = [row[2] for row in rows if row[2] is not None]
+    return counts, (max(updated) if updated else None)
+
+def recount_file_counts():
+    """Recompute every folder count from the documents table."""
+    with write_transaction() as conn:
+        _sync_count_folders(conn, recount=True)
@@ -1,9 +1,167 @@
-from sentence_transformers import SentenceTransformer
+import threading
+import time
+
+from config import EMBED_BACKEND, EMBED_TOKEN_BUDGET
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+BACKENDS = ("torch", "int8", "onnx")
+MAX_CHARS_PER_TOKEN = 10  # text beyond window * this can never reach the model, cut it before tokenizing
 
 class Embedder:
-    def __init__(self):
-        print("Loading embedding model...")
-        self.model = SentenceTransformer("all-MiniLM-L6-v2")
+    """
+    Sentence-transformer wrapper that loads the model on first use
+    (sentence_transformers/torch are only imported then).
+
+    backend: "torch" full-precision reference, "int8" dynamic int8 quantization
+    of the Linear layers (CPU), "onnx" ONNX Runtime export of the same model.
+    """
+
+    def __init__(self, model_name=MODEL_NAME, backend=EMBED_BACKEND):
+        self.model_name = model_name
+        self.backend = backend if backend in BACKENDS else "torch"
+        self._model = None
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._tokens = 0
+        self._seconds = 0.0
+
+    @property
+    def model(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    print(f"Loading embedding model ({self.backend})...")
+                    self._model = self._load()
+        return self._model
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        if self.backend == "onnx":
+            try:
+                # Needs sentence-transformers >= 3.2 with optimum[onnxruntime]
+                return SentenceTransformer(self.model_name, backend="onnx")
+            except Exception as e:
+                print(f"⚠️ ONNX backend unavailable ({e}); falling back to torch")
+                self.backend = "torch"
+
+        model = SentenceTransformer(self.model_name, device="cpu" if self.backend == "int8" else None)
+        if self.backend == "int8":
+            import torch
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        return model
+
+    @property
+    def is_loaded(self):
+        return self._model is not None
+
+    def warm_up(self):
+        """Load the model in a background thread so the first query doesn't pay for it."""
+        threading.Thread(target=lambda: self.model, daemon=True).start()
 
     def embed_texts(self, texts):
-        return self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)  # <== THIS IS CRUCIAL
+        """
+        Embed texts in their original order. Each text is cut to what the model window can
+        hold before tokenizing, then texts of similar token length are batched together so
+        every batch stays under EMBED_TOKEN_BUDGET padded tokens. Texts are tokenized once:
+        the batches are padded from those encodings and run through the model directly
+        (model.encode would tokenize them again).
+        """
+        import numpy as np
+        import torch
+
+        model = self.model
+        window = model.max_seq_length or 256
+        texts = [(t or "")[:window * MAX_CHARS_PER_TOKEN] for t in texts]
+        if not texts:
+            return np.empty((0, model.get_sentence_embedding_dimension()), dtype="float32")
+
+        start = time.perf_counter()
+        encodings = model.tokenizer(texts, truncation=True, max_length=window)
+        lengths = [len(ids) for ids in encodings["input_ids"]]
+        order = sorted(range(len(texts)), key=lengths.__getitem__)
+        vectors = [None] * len(texts)
+        i = 0
+        while i < len(order):
+            # Sorted by length, so the last text taken is the longest (the padded width)
+            j = i + 1
+            while j < len(order) and (j - i + 1) * lengths[order[j]] <= EMBED_TOKEN_BUDGET:
+                j += 1
+            batch = order[i:j]
+            features = model.tokenizer.pad({key: [encodings[key][k] for k in batch] for key in encodings.keys()},
+                                           return_tensors="pt")
+            features = {key: value.to(model.device) for key, value in features.items()}
+            with torch.inference_mode():
+                encoded = model(features)["sentence_embedding"].float().cpu().numpy()
+            for k, vector in zip(batch, encoded):
+                vectors[k] = vector
+            i = j
+
+        with self._stats_lock:
+            self._tokens += sum(lengths)
+            self._seconds += time.perf_counter() - start
+        return np.vstack(vectors)
+
+    def token_stats(self):
+        """Tokens actually fed to the model so far, and tokens per second of embedding time."""
+        with self._stats_lock:
+            return {"items": self._tokens, "perSec": round(self._tokens / self._seconds, 1) if self._seconds else 0.0}
+
+def compare_backends(texts, backend, reference="torch"):
+    """
+    Parity + throughput of `backend` against the `reference` backend on the same texts:
+    per-text cosine agreement (mean / min) and documents per second for each.
+    Raise RuntimeError if either backend falls back to another one (nothing to compare).
+    """
+    import numpy as np
+
+    vectors, docs_per_sec = {}, {}
+    for name in (reference, backend):
+        embedder = Embedder(backend=name)
+        embedder.embed_texts(texts[:8])  # load + warm up outside the timing
+        if embedder.backend != name:
+            raise RuntimeError(f"{name} backend unavailable (fell back to {embedder.backend})")
+        start = time.perf_counter()
+        v = np.asarray(embedder.embed_texts(texts), dtype="float32")
+        docs_per_sec[name] = round(len(texts) / (time.perf_counter() - start), 1)
+        vectors[name] = v / np.linalg.norm(v, axis=1, keepdims=True)
+
+    cosine = np.sum(vectors[reference] * vectors[backend], axis=1)
+    return {
+        "reference": reference,
+        "backend": backend,
+        "texts": len(texts),
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        "docs_per_sec": docs_per_sec,
+    }
+
+_shared_embedder = None
+_shared_lock = threading.Lock()
+
+def get_embedder():
+    """The one Embedder shared by search and indexing in this process."""
+    global _shared_embedder
+    if _shared_embedder is None:
+        with _shared_lock:
+            if _shared_embedder is None:
+                _shared_embedder = Embedder()
+    return _shared_embedder
+
+if __name__ == "__main__":
+    # Parity check: python embedder.py [int8|onnx]
+    import json
+    import sys
+    from db import read_connection
+
+    backend = sys.argv[1] if len(sys.argv) > 1 else "int8"
+    try:
+        with read_connection() as conn:
+            texts = [row[0] for row in conn.execute(
+                "SELECT content FROM documents_fts WHERE content != '' LIMIT 512"
+            )]
+    except Exception:
+        texts = []
+    if not texts:
+        texts = [f"Sample document {i} about invoices, travel plans and project notes." for i in range(512)]
+    print(json.dumps(compare_backends(texts, backend), indent=2))
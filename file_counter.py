@@ -1,39 +1,19 @@
 from flask import Flask, jsonify
-import os
+from datetime import datetime
 
-app = Flask(__name__)
-
-# 📁 Define key folders to scan
-FOLDER_PATHS = {
-    "Documents": os.path.join(os.path.expanduser("~"), "Documents"),
-    "Downloads": os.path.join(os.path.expanduser("~"), "Downloads"),
-    "Desktop": os.path.join(os.path.expanduser("~"), "Desktop"),
-    "C Drive": "C:\\",
-    "D Drive": "D:\\",
-    "Pictures": os.path.join(os.path.expanduser("~"), "Pictures"),
-    "Others": os.path.join(os.path.expanduser("~"), "AppData\\Local\\Temp")
-}
+from db import init_db, get_file_counts
 
-# 🔢 Count files in a folder (including all subfolders)
-def count_files_in_folder(path):
-    count = 0
-    try:
-        for root, dirs, files in os.walk(path):  # <-- recursive scan
-            count += len(files)
-    except Exception as e:
-        print(f"⚠ Error accessing {path}: {e}")
-    return count
+app = Flask(__name__)
 
 # 🌐 API endpoint to return file counts
+# Counts of indexed files per folder (db.COUNT_FOLDERS) are kept current by the indexer,
+# so this never walks the disk
 @app.route("/count_files", methods=["POST"])
 def count_files():
-    results = {}
-    for folder, path in FOLDER_PATHS.items():
-        if os.path.exists(path):
-            results[folder] = count_files_in_folder(path)
-        else:
-            results[folder] = 0
+    results, updated_at = get_file_counts()
+    results["updatedAt"] = datetime.fromtimestamp(updated_at).isoformat(timespec="seconds") if updated_at else None
     return jsonify(results)
 
 if __name__ == "__main__":
+    init_db()
     app.run(port=5005, debug=True)
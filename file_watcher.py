@@ -1,18 +1,128 @@
 # file_watcher.py
+import os
 import time
 import threading
 import logging
-from app import run_smart_rescan_bg, STATE, STATE_LOCK
 
-SCAN_INTERVAL_SECONDS = 60  # check every 1 minute
+from db import DB_PATH
+from scanner_fast import allowed, EXCLUDED_DIRS
 
-def start_file_watch():
+SCAN_INTERVAL_SECONDS = 60     # polling fallback (watchdog not installed): incremental rescan every minute
+DEBOUNCE_SECONDS = 2           # apply events once they have been quiet this long...
+MAX_DELAY_SECONDS = 30         # ...or at the latest this long after the first pending event
+RECONCILE_SECONDS = 6 * 3600   # full rescan as a safety net for missed events (and in-place edits when polling)
+
+class ChangeCollector:
+    """Coalesces watcher events (create / modify / delete / rename) into one set of affected paths."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = set()
+        self._first = self._last = None
+
+    def add(self, *paths):
+        now = time.monotonic()
+        with self._lock:
+            self._paths.update(paths)
+            self._first = self._first or now
+            self._last = now
+
+    def take(self, force=False):
+        """Return the pending paths once debounced (or when forced), else None."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._paths:
+                return None
+            if not force and now - self._last < DEBOUNCE_SECONDS and now - self._first < MAX_DELAY_SECONDS:
+                return None
+            paths, self._paths, self._first, self._last = self._paths, set(), None, None
+            return paths
+
+# Our own database is a .db file too: its writes must not trigger re-indexing
+_OWN_FILES = {os.path.normcase(os.path.abspath(DB_PATH))}
+
+def _relevant(path, is_directory):
+    if not path or os.path.normcase(os.path.abspath(path)) in _OWN_FILES:
+        return False
+    if is_directory:
+        return not any(part in EXCLUDED_DIRS for part in path.lower().split(os.sep))
+    return allowed(path)
+
+def _make_handler(collector):
+    from watchdog.events import FileSystemEventHandler
+
+    class _Handler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # Directory "modified" just mirrors the file events inside it; open/close carry no change
+            if event.event_type not in ("created", "modified", "deleted", "moved"):
+                return
+            if event.is_directory and event.event_type == "modified":
+                return
+            paths = [p for p in (event.src_path, getattr(event, "dest_path", "")) if _relevant(p, event.is_directory)]
+            if paths:
+                collector.add(*paths)
+
+    return _Handler()
+
+def _idle(STATE, STATE_LOCK):
+    with STATE_LOCK:
+        return STATE["termsAccepted"] and STATE["job"]["status"] != "running"
+
+def _poll(run_smart_rescan_bg, STATE, STATE_LOCK):
+    """
+    Incremental rescans every SCAN_INTERVAL_SECONDS, plus a full one every RECONCILE_SECONDS:
+    in-place edits leave the directory mtime unchanged, so only the full rescan sees them.
+    """
+    last_reconcile = time.monotonic()
+    while True:
+        if _idle(STATE, STATE_LOCK):
+            if time.monotonic() - last_reconcile >= RECONCILE_SECONDS:
+                logging.info("🔄 Periodic full reconcile triggered from watcher.")
+                if run_smart_rescan_bg():
+                    last_reconcile = time.monotonic()
+            else:
+                logging.info("🔄 Auto Smart Rescan Triggered from watcher.")
+                run_smart_rescan_bg(incremental=True)
+        time.sleep(SCAN_INTERVAL_SECONDS)
+
+# The jobs and shared state are passed in by app.py (importing app here
+# would execute it a second time when it runs as __main__).
+def start_file_watch(roots, run_path_changes_bg, run_smart_rescan_bg, STATE, STATE_LOCK):
+    """
+    Watch roots with OS notifications (watchdog: ReadDirectoryChangesW / inotify / FSEvents) and
+    hand only the affected paths to run_path_changes_bg. Without watchdog, poll instead.
+    """
+    try:
+        from watchdog.observers import Observer
+    except ImportError:
+        logging.warning("⚠ watchdog not installed; falling back to polling rescans")
+        return _poll(run_smart_rescan_bg, STATE, STATE_LOCK)
+
+    collector = ChangeCollector()
+    handler = _make_handler(collector)
+    observer = Observer()
+    for root in roots:
+        if not os.path.isdir(root):
+            continue
+        try:
+            observer.schedule(handler, root, recursive=True)
+        except Exception as e:
+            logging.warning(f"⚠ Cannot watch {root}: {e}")
+    observer.start()
+    logging.info(f"👀 Watching {roots} for changes")
+
+    last_reconcile = time.monotonic()
     while True:
-        with STATE_LOCK:
-            already_running = STATE["job"]["status"] == "running"
-            print("🟢 termsAccepted:", STATE["termsAccepted"])
-            print("🟡 already_running:", already_running)
-        if not already_running and STATE["termsAccepted"]:
-            logging.info("🔄 Auto Smart Rescan Triggered from watcher.")
-            threading.Thread(target=run_smart_rescan_bg, daemon=True).start()
-        time.sleep(SCAN_INTERVAL_SECONDS)
\ No newline at end of file
+        time.sleep(0.5)
+        if not _idle(STATE, STATE_LOCK):
+            continue  # events keep coalescing while another job runs
+        if time.monotonic() - last_reconcile >= RECONCILE_SECONDS:
+            last_reconcile = time.monotonic()
+            collector.take(force=True)  # the full rescan covers anything pending
+            logging.info("🔄 Periodic full reconcile triggered from watcher.")
+            if not run_smart_rescan_bg():
+                last_reconcile = 0  # busy: reconcile once the running job is done
+            continue
+        paths = collector.take()
+        if paths and not run_path_changes_bg(paths):
+            collector.add(*paths)  # another job took the slot meanwhile; retry after it
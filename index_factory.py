@@ -0,0 +1,273 @@
+# index_factory.py
+import math
+import time
+
+import faiss
+import numpy as np
+
+from config import INDEX_TYPE, INDEX_RERANK_K_FACTOR, IVF_NPROBE, HNSW_EF_SEARCH
+
+INDEX_TYPES = ("auto", "flat", "ivf", "ivfsq", "ivfpq", "hnsw")
+
+# auto: exact search for small corpora, compressed IVF variants as the corpus grows
+AUTO_IVF_MIN = 50_000      # from here: IVF + 8-bit scalar quantizer (4x smaller)
+AUTO_PQ_MIN = 1_000_000    # from here: IVF + product quantizer (32x smaller)
+MIN_TRAIN = {"ivf": 1_000, "ivfsq": 1_000, "ivfpq": 10_000}
+TRAIN_SAMPLE = 100_000
+STALE_FRACTION = 0.2       # rebuild once this share of vectors is dead (indexes without remove_ids)
+FILTER_EXACT_MAX = 20_000  # filtered ANN searches over at most this many vectors score them exactly
+
+
+def choose_index_type(n, requested=INDEX_TYPE, rerank=INDEX_RERANK_K_FACTOR):
+    """Resolve the index type for n vectors; returns e.g. "ivfpq" or "ivfpq+rerank"."""
+    index_type = requested if requested in INDEX_TYPES else "auto"
+    if index_type == "auto":
+        index_type = "flat" if n < AUTO_IVF_MIN else ("ivfsq" if n < AUTO_PQ_MIN else "ivfpq")
+    if index_type == "ivfpq" and n < MIN_TRAIN["ivfpq"]:
+        index_type = "ivfsq"
+    if index_type in MIN_TRAIN and n < MIN_TRAIN[index_type]:
+        index_type = "flat"
+    if rerank > 0 and index_type != "flat":
+        index_type += "+rerank"
+    return index_type
+
+
+def _factory_string(index_type, n, d):
+    base, _, rerank = index_type.partition("+")
+    nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+    pq_m = next(m for m in (48, 32, 24, 16, 12, 8, 4, 2, 1) if d % m == 0)
+    spec = {
+        "flat": "Flat",
+        "hnsw": "HNSW32",
+        "ivf": f"IVF{nlist},Flat",
+        "ivfsq": f"IVF{nlist},SQ8",
+        "ivfpq": f"IVF{nlist},PQ{pq_m}",
+    }[base]
+    if base.startswith("ivf") and not rerank:
+        # IVF keeps ids natively (and removes by id); IDMap2 only renumbers correctly over flat storage
+        return spec
+    if rerank:
+        spec += ",RFlat"
+    return "IDMap2," + spec
+
+
+def _new_index(index_type, n, d):
+    index = faiss.index_factory(d, _factory_string(index_type, n, d), faiss.METRIC_INNER_PRODUCT)
+    if isinstance(index, faiss.IndexIVF):
+        index.set_direct_map_type(faiss.DirectMap.Hashtable)  # remove/reconstruct by documents.id
+    return index
+
+
+def build_index(vectors, ids, index_type=INDEX_TYPE):
+    """Build (and train if needed) an id-mapped index for normalized float32 vectors."""
+    n, d = vectors.shape
+    index_type = choose_index_type(n, index_type)
+    index = _new_index(index_type, n, d)
+    if not index.is_trained:
+        sample = vectors
+        if n > TRAIN_SAMPLE:
+            sample = vectors[np.random.default_rng(0).choice(n, TRAIN_SAMPLE, replace=False)]
+        index.train(np.ascontiguousarray(sample))
+    index.add_with_ids(vectors, ids)
+    configure_search(index)
+    return index
+
+
+def _inner(index):
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def index_type_of(index):
+    inner = _inner(index)
+    suffix = ""
+    if isinstance(inner, faiss.IndexRefine):
+        inner, suffix = faiss.downcast_index(inner.base_index), "+rerank"
+    if isinstance(inner, faiss.IndexHNSW):
+        base = "hnsw"
+    elif isinstance(inner, faiss.IndexIVFPQ):
+        base = "ivfpq"
+    elif isinstance(inner, faiss.IndexIVFScalarQuantizer):
+        base = "ivfsq"
+    elif isinstance(inner, faiss.IndexIVF):
+        base = "ivf"
+    else:
+        base = "flat"
+    return base + suffix
+
+
+def is_exact_storage(index):
+    """True if stored vectors can be reconstructed losslessly (safe to rebuild from)."""
+    return isinstance(_inner(index), (faiss.IndexFlat, faiss.IndexHNSWFlat, faiss.IndexRefine))
+
+
+def configure_search(index):
+    """Apply query-time parameters (nprobe / efSearch / re-rank factor)."""
+    params = faiss.ParameterSpace()
+    index_type = index_type_of(index)
+    try:
+        if index_type.startswith("ivf"):
+            params.set_index_parameter(index, "nprobe", IVF_NPROBE)
+        if index_type.startswith("hnsw"):
+            params.set_index_parameter(index, "efSearch", HNSW_EF_SEARCH)
+        if index_type.endswith("+rerank"):
+            params.set_index_parameter(index, "k_factor_rf", INDEX_RERANK_K_FACTOR)
+    except RuntimeError as e:
+        print(f"⚠️ Could not set search parameters on {index_type} index: {e}")
+
+
+def _selector_params(inner, selector, k):
+    """SearchParameters restricting a search of inner (an unwrapped index) to selector, query-time settings kept."""
+    if isinstance(inner, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = max(HNSW_EF_SEARCH, k)
+    elif isinstance(inner, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = IVF_NPROBE
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return params
+
+
+def _refine_search(index, queries, k, selector):
+    """
+    Selector-filtered search of an IDMap2 + IndexRefine index (IndexRefine rejects search
+    parameters): the base index is searched for k * k_factor candidates inside the selection,
+    which are then re-ranked exactly from the refine vectors.
+    """
+    refine = _inner(index)
+    base = faiss.downcast_index(refine.base_index)
+    k_base = k * max(int(refine.k_factor), 1)
+    translated = faiss.IDSelectorTranslated(index.id_map, selector)  # documents.id -> internal ids
+    _, labels = base.search(queries, k_base, params=_selector_params(base, translated, k_base))
+
+    D = np.full((len(queries), k), -np.inf, dtype="float32")
+    I = np.full((len(queries), k), -1, dtype="int64")
+    for row, (query, candidates) in enumerate(zip(queries, labels)):
+        candidates = candidates[candidates >= 0]
+        if len(candidates) == 0:
+            continue
+        scores = refine.refine_index.reconstruct_batch(candidates) @ query
+        best = np.argsort(-scores)[:k]
+        D[row, :len(best)] = scores[best]
+        I[row, :len(best)] = [index.id_map.at(int(label)) for label in candidates[best]]
+    return D, I
+
+
+def filtered_search(index, queries, k, ids, selector=None):
+    """
+    index.search restricted to ids (sorted int64 documents.id, all present in the index).
+    Large selections are filtered inside the index through an ID selector, so no more
+    vectors are scored than unfiltered. Small ones (where HNSW / IVF probing would miss most
+    allowed vectors) are scored exactly over just the selected vectors.
+    selector: IDSelector over ids, for callers that cache it across queries.
+    """
+    n = len(queries)
+    D = np.full((n, k), -np.inf, dtype="float32")
+    I = np.full((n, k), -1, dtype="int64")
+    if len(ids) == 0:
+        return D, I
+
+    index_type = index_type_of(index)
+    if index_type == "flat" or len(ids) > FILTER_EXACT_MAX:
+        selector = selector or faiss.IDSelectorBatch(ids)
+        if index_type.endswith("+rerank"):
+            return _refine_search(index, queries, k, selector)
+        return index.search(queries, k, params=_selector_params(_inner(index), selector, k))
+
+    scores = queries @ index.reconstruct_batch(ids).T
+    top = min(k, len(ids))
+    best = np.argpartition(-scores, top - 1, axis=1)[:, :top]
+    order = np.take_along_axis(scores, best, axis=1).argsort(axis=1)[:, ::-1]
+    best = np.take_along_axis(best, order, axis=1)
+    D[:, :top] = np.take_along_axis(scores, best, axis=1)
+    I[:, :top] = ids[best]
+    return D, I
+
+
+def live_vectors(index, live_ids):
+    """Return (ids, vectors) for live ids; for re-added ids the newest vector wins."""
+    ids = faiss.vector_to_array(index.id_map)
+    vectors = index.index.reconstruct_n(0, index.ntotal)
+    last = len(ids) - 1 - np.unique(ids[::-1], return_index=True)[1]
+    last = last[np.isin(ids[last], np.fromiter(live_ids, dtype="int64"))]
+    return ids[last], np.ascontiguousarray(vectors[last])
+
+
+def maybe_rebuild(index, live_ids, requested=INDEX_TYPE):
+    """
+    Rebuild when the corpus size calls for another index type, or when too many
+    vectors are dead (HNSW / re-rank indexes cannot remove in place).
+    Lossy (quantized) storage is never re-encoded from itself; it waits for a full scan.
+    """
+    n = len(live_ids)
+    target = choose_index_type(n, requested)
+    stale = index.ntotal - n
+    if target == index_type_of(index) and stale <= STALE_FRACTION * max(index.ntotal, 1):
+        return index
+    if n == 0 or not is_exact_storage(index):
+        return index
+    ids, vectors = live_vectors(index, live_ids)
+    print(f"🧭 Rebuilding FAISS index as {target} ({n} vectors, {stale} stale)")
+    return build_index(vectors, ids, requested)
+
+
+def recall_report(vectors, k=10, n_queries=200, types=("flat", "hnsw", "ivf", "ivfsq", "ivfpq")):
+    """
+    Recall@k / latency / size for each index type over the same vectors.
+    Queries are held-out corpus vectors; ground truth is exact inner-product search.
+    """
+    rng = np.random.default_rng(0)
+    n_queries = min(n_queries, len(vectors) // 10 or 1)
+    picked = rng.choice(len(vectors), n_queries, replace=False)
+    mask = np.ones(len(vectors), dtype=bool)
+    mask[picked] = False
+    queries, base = vectors[picked], np.ascontiguousarray(vectors[mask])
+    ids = np.arange(len(base), dtype="int64")
+
+    truth = build_index(base, ids, "flat").search(queries, k)[1]
+    rows = []
+    for index_type in types:
+        for rerank in ((0, INDEX_RERANK_K_FACTOR or 4) if index_type != "flat" else (0,)):
+            resolved = choose_index_type(len(base), index_type, rerank)
+            start = time.perf_counter()
+            index = _new_index(resolved, len(base), base.shape[1])
+            if not index.is_trained:
+                index.train(base[:TRAIN_SAMPLE])
+            index.add_with_ids(base, ids)
+            build_s = time.perf_counter() - start
+            configure_search(index)
+            if rerank:
+                faiss.ParameterSpace().set_index_parameter(index, "k_factor_rf", rerank)
+
+            start = time.perf_counter()
+            found = index.search(queries, k)[1]
+            latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+            recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+            rows.append({
+                "type": resolved,
+                "recall": round(float(recall), 4),
+                "latency_ms": round(latency_ms, 3),
+                "build_s": round(build_s, 2),
+                "bytes_per_vector": round(faiss.serialize_index(index).size / len(base), 1),
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    # Recall-vs-latency report over the vectors of the published index
+    from index_store import generation_paths
+
+    paths = generation_paths()
+    if paths is None:
+        raise SystemExit("No published index; run a full scan first.")
+    index = faiss.read_index(paths[0])
+    if not is_exact_storage(index):
+        raise SystemExit("Published index is quantized; run a full scan with DOCFINDER_INDEX_TYPE=flat first.")
+    _, vectors = live_vectors(index, faiss.vector_to_array(index.id_map))
+    print(f"{len(vectors)} vectors, current type: {index_type_of(index)}")
+    print(f"{'type':<16}{'recall@10':>10}{'ms/query':>10}{'build s':>10}{'B/vector':>10}")
+    for row in recall_report(vectors):
+        print(f"{row['type']:<16}{row['recall']:>10}{row['latency_ms']:>10}{row['build_s']:>10}{row['bytes_per_vector']:>10}")
@@ -0,0 +1,231 @@
+import os
+import pickle
+import shutil
+import threading
+import time
+
+# ✅ Index & metadata store (shared by indexing and search)
+# Every publish writes index + metadata into a new generation folder (gen-<ns>), then
+# atomically repoints CURRENT at it: readers never see a half-written file or an index
+# paired with another generation's metadata.
+STORE_DIR = "Aaryan_store"
+INDEX_FILE = "index.faiss"
+META_FILE = "meta.pkl"
+# Vector id -> path table of a generation: sorted ids, byte offsets, one UTF-8 blob (all mmapped)
+IDS_FILE, OFFSETS_FILE, PATHS_FILE = "ids.npy", "offsets.npy", "paths.bin"
+CURRENT_PATH = os.path.join(STORE_DIR, "CURRENT")
+KEEP_GENERATIONS = 2  # the current one and its predecessor (a reader may still be opening it)
+
+# Single-file layout from before generations; still readable until the first publish, unless
+# its meta.pkl is a positional path list (ids are vector positions, not documents.id)
+INDEX_PATH = os.path.join(STORE_DIR, INDEX_FILE)
+META_PATH = os.path.join(STORE_DIR, META_FILE)
+VERSION_PATH = os.path.join(STORE_DIR, "version")
+
+
+def read_version():
+    """Return the published generation name, or None if nothing was published yet."""
+    for path in (CURRENT_PATH, VERSION_PATH):
+        try:
+            with open(path, "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            continue
+    return None
+
+
+def generation_paths(version=None):
+    """
+    (index path, metadata path) of a generation (default: the current one), or None.
+    The metadata path is the generation folder (path table), or a legacy id-keyed meta.pkl.
+    A legacy positional index counts as missing, so it is rebuilt instead of searched.
+    """
+    version = version or read_version()
+    if version and version.startswith("gen-"):
+        folder = os.path.join(STORE_DIR, version)
+        return os.path.join(folder, INDEX_FILE), folder
+    if os.path.exists(INDEX_PATH) and os.path.exists(META_PATH) and not _is_positional(META_PATH):
+        return INDEX_PATH, META_PATH
+    return None
+
+
+_positional = {}  # (meta.pkl path, mtime) -> holds a positional path list
+
+
+def _is_positional(meta_path):
+    """True if a legacy meta.pkl is a path list (vector position = id); read once per version of the file."""
+    try:
+        key = (meta_path, os.stat(meta_path).st_mtime_ns)
+        if key not in _positional:
+            with open(meta_path, "rb") as f:
+                _positional[key] = isinstance(pickle.load(f), list)
+        return _positional[key]
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return True  # unreadable: rebuild it as well
+
+
+def index_exists():
+    return generation_paths() is not None
+
+
+def new_generation():
+    """Create an unpublished generation folder; return (version, index path, folder)."""
+    version = f"gen-{time.time_ns()}"
+    folder = os.path.join(STORE_DIR, version)
+    os.makedirs(folder)
+    return (version,) + generation_paths(version)
+
+
+def publish_generation(version):
+    """
+    Make a fully written generation current so every IndexHolder swaps to it on its next
+    query, then drop generations older than KEEP_GENERATIONS.
+    """
+    folder = os.path.join(STORE_DIR, version)
+    for name in os.listdir(folder):
+        with open(os.path.join(folder, name), "rb+") as f:
+            os.fsync(f.fileno())  # durable before it becomes visible
+    tmp_path = CURRENT_PATH + ".tmp"
+    with open(tmp_path, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, CURRENT_PATH)
+    _prune_generations(version)
+    return version
+
+
+def _prune_generations(current):
+    generations = sorted(name for name in os.listdir(STORE_DIR) if name.startswith("gen-"))
+    keep = set(generations[-KEEP_GENERATIONS:]) | {current}
+    for name in generations:
+        if name not in keep and name < current:  # newer folders may still be being written
+            shutil.rmtree(os.path.join(STORE_DIR, name), ignore_errors=True)
+    for path in (INDEX_PATH, META_PATH, VERSION_PATH):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class PathTable:
+    """
+    Read-only {vector id: path} mapping over the memory-mapped files of a generation.
+    Paths stay UTF-8 bytes in the page cache and are decoded only for the hits looked up.
+    """
+
+    def __init__(self, folder):
+        import numpy as np
+
+        self._ids = np.load(os.path.join(folder, IDS_FILE), mmap_mode="r")
+        self._offsets = np.load(os.path.join(folder, OFFSETS_FILE), mmap_mode="r")
+        blob_path = os.path.join(folder, PATHS_FILE)
+        # An empty file cannot be mapped
+        self._blob = np.memmap(blob_path, dtype="uint8", mode="r") if os.path.getsize(blob_path) else b""
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _position(self, doc_id):
+        i = int(self._ids.searchsorted(doc_id))
+        return i if i < len(self._ids) and self._ids[i] == doc_id else None
+
+    def __contains__(self, doc_id):
+        return self._position(doc_id) is not None
+
+    def get(self, doc_id, default=None):
+        i = self._position(doc_id)
+        if i is None:
+            return default
+        return bytes(self._blob[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8", "surrogateescape")
+
+    def keys(self):
+        return self._ids.tolist()
+
+    @property
+    def ids(self):
+        """Sorted int64 array of every id (memory-mapped)."""
+        return self._ids
+
+    def to_dict(self):
+        blob = bytes(self._blob)
+        offsets = self._offsets.tolist()
+        return {
+            doc_id: blob[offsets[i]:offsets[i + 1]].decode("utf-8", "surrogateescape")
+            for i, doc_id in enumerate(self._ids.tolist())
+        }
+
+
+def write_path_table(folder, id_to_path: dict):
+    """Write {vector id: path} as a PathTable into a generation folder."""
+    import numpy as np
+
+    ids = sorted(id_to_path)
+    encoded = [id_to_path[doc_id].encode("utf-8", "surrogateescape") for doc_id in ids]
+    offsets = np.zeros(len(ids) + 1, dtype="int64")
+    np.cumsum([len(p) for p in encoded], out=offsets[1:])
+    np.save(os.path.join(folder, IDS_FILE), np.array(ids, dtype="int64"))
+    np.save(os.path.join(folder, OFFSETS_FILE), offsets)
+    with open(os.path.join(folder, PATHS_FILE), "wb") as f:
+        f.write(b"".join(encoded))
+
+
+def read_path_table(meta_path):
+    """PathTable of a generation folder, or the {vector id: path} dict of a legacy meta.pkl."""
+    if os.path.isdir(meta_path):
+        return PathTable(meta_path)
+    with open(meta_path, "rb") as f:
+        return pickle.load(f)
+
+
+class IndexHolder:
+    """
+    Keeps the FAISS index and path metadata resident in memory.
+    Files are only re-read when a new generation is published. The fast path takes no lock:
+    a query uses whichever snapshot it picked up, so in-flight searches finish on the old
+    generation while new ones see the new one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = (None, None)  # (version, (index, paths)), swapped as one object
+
+    def get(self):
+        """Return (index, PathTable or {vector id: path}), loading them if a new generation was published."""
+        version = read_version()
+        loaded, snapshot = self._current
+        if snapshot is not None and version == loaded:
+            return snapshot
+
+        with self._lock:  # only one thread loads a new generation
+            loaded, snapshot = self._current
+            if snapshot is None or version != loaded:
+                try:
+                    snapshot = self._load(version)
+                except (FileNotFoundError, RuntimeError):  # faiss reports a missing file as RuntimeError
+                    if read_version() == version:
+                        raise
+                    # Pruned between reading CURRENT and opening it: a newer one is current
+                    version = read_version()
+                    snapshot = self._load(version)
+                self._current = (version, snapshot)
+                print(f"📦 Loaded FAISS index ({snapshot[0].ntotal} vectors, version={version})")
+            return snapshot
+
+    @staticmethod
+    def _load(version):
+        import faiss  # deferred: keeps server startup fast
+        from index_factory import configure_search
+
+        paths = generation_paths(version)
+        if paths is None:
+            raise FileNotFoundError("No FAISS index has been published")
+        index_path, meta_path = paths
+        index = faiss.read_index(index_path)
+        paths = read_path_table(meta_path)
+        configure_search(index)
+        return index, paths
+
+
+# ✅ Process-wide holder shared by every search
+index_holder = IndexHolder()
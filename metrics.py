@@ -0,0 +1,69 @@
+# metrics.py
+import threading
+import time
+from contextlib import contextmanager
+
+# 📈 Process-wide timing counters and latency histograms, rendered in Prometheus text format
+
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+class Histogram:
+    """Latency histogram with one label; also counts the items each observation covered."""
+
+    def __init__(self, name, help_text, label):
+        self.name = name
+        self.help = help_text
+        self.label = label
+        self._lock = threading.Lock()
+        self._series = {}  # label value -> [bucket counts, sum, count, items]
+
+    def observe(self, value, seconds, items=1):
+        with self._lock:
+            series = self._series.get(value)
+            if series is None:
+                series = self._series[value] = [[0] * len(BUCKETS), 0.0, 0, 0]
+            for i, bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    series[0][i] += 1
+            series[1] += seconds
+            series[2] += 1
+            series[3] += items
+
+    def render(self):
+        lines = [f"# HELP {self.name}_seconds {self.help}", f"# TYPE {self.name}_seconds histogram"]
+        items = [f"# HELP {self.name}_items_total Items covered by {self.name}_seconds observations",
+                 f"# TYPE {self.name}_items_total counter"]
+        with self._lock:
+            for value, (buckets, total, count, n) in sorted(self._series.items()):
+                label = f'{self.label}="{value}"'
+                for bound, hits in zip(BUCKETS, buckets):
+                    lines.append(f'{self.name}_seconds_bucket{{{label},le="{bound}"}} {hits}')
+                lines.append(f'{self.name}_seconds_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f"{self.name}_seconds_sum{{{label}}} {total:.6f}")
+                lines.append(f"{self.name}_seconds_count{{{label}}} {count}")
+                items.append(f"{self.name}_items_total{{{label}}} {n}")
+        return lines + items
+
+# walk, stat, hash, embed, db_write, index_build, index_save, query_embed,
+# faiss_search, filename_search, keyword_search
+STAGES = Histogram("docfinder_stage", "Time per call of each pipeline / search stage", "stage")
+# Text extraction per file, by extension (PDF parsing vs OCR vs spreadsheets)
+EXTRACT = Histogram("docfinder_extract", "Time per file of text extraction by extension", "ext")
+
+def observe(stage, seconds, items=1):
+    STAGES.observe(stage, seconds, items)
+
+def observe_extract(ext, seconds):
+    EXTRACT.observe(ext or "none", seconds)
+
+@contextmanager
+def timed(stage, items=1):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - start, items)
+
+def render():
+    """All metrics in Prometheus text exposition format (version 0.0.4)."""
+    return "\n".join(STAGES.render() + EXTRACT.render()) + "\n"
@@ -0,0 +1,221 @@
+# pipeline.py
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import metrics
+from config import EXTRACT_WORKERS, EMBED_BATCH_SIZE, PIPELINE_QUEUE_SIZE
+from db import get_cached_content
+from reader import extract_content, file_content_hash, HASH_CHUNK_SIZE
+
+# Keep this module light: worker processes import it to run extract_document.
+
+_DONE = object()
+
+# ✅ Extraction stage (runs inside a worker process)
+def extract_document(path, preview=False):
+    """
+    Stat, hash and extract one file. Text/vector are reused from the content cache
+    when these exact bytes were seen before. Return a doc dict, or None if the file vanished.
+    preview=True is the cheap first tier (see reader.extract_content); doc["depth"] is 1 when
+    the file still needs a full extraction, 2 when its content is complete. Previews only hash
+    files that fit in one read; bigger ones are hashed when they are deepened.
+    Stage timings travel back in doc["timings"] (metrics live in the parent process).
+    """
+    timings = {}
+    start = time.perf_counter()
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    timings["stat"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    content_hash = None if preview and stat.st_size > HASH_CHUNK_SIZE else file_content_hash(path)
+    cached = get_cached_content(content_hash)
+    timings["hash"] = time.perf_counter() - start
+    if cached:
+        # Only fully extracted content is cached
+        content, vector = cached
+        depth = 2
+    else:
+        start = time.perf_counter()
+        (content, complete), vector = extract_content(path, preview), None
+        depth = 2 if complete else 1
+        timings["preview" if preview else "extract"] = time.perf_counter() - start
+
+    return {
+        "filename": os.path.basename(path),
+        "path": path,
+        "extension": os.path.splitext(path)[1].lower(),
+        "size": stat.st_size,
+        "modified": stat.st_mtime,
+        "content": content,
+        "content_hash": content_hash,
+        "vector": vector,
+        "depth": depth,
+        "timings": timings
+    }
+
+
+class PipelineStats:
+    """Thread-safe per-stage item counters, reported as items/sec since the run started."""
+
+    def __init__(self, stages):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._counts = {stage: 0 for stage in stages}
+        self._done = set()
+
+    def add(self, stage, n=1):
+        with self._lock:
+            self._counts[stage] += n
+
+    def finish(self, stage):
+        """Mark a stage as having seen all its input (the walk total is then final)."""
+        with self._lock:
+            self._done.add(stage)
+
+    def snapshot(self):
+        elapsed = max(time.monotonic() - self._started, 1e-6)
+        with self._lock:
+            return {
+                stage: {"items": count, "perSec": round(count / elapsed, 1), "done": stage in self._done}
+                for stage, count in self._counts.items()
+            }
+
+
+def _put(q, item, stop):
+    """Blocking put on a bounded queue that gives up once the pipeline is stopping."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=0.5)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def run_pipeline(paths, embed, write, workers=None, batch_size=None, on_progress=None, preview=False,
+                 until=None, failed=None):
+    """
+    Stream files through walk -> extract (process pool) -> embed (fixed-size batches) -> write.
+    Nothing is accumulated across batches, so memory depends on batch_size, not corpus size.
+
+    paths:   iterable of file paths (may be a lazy walker generator)
+    embed:   fn(batch_docs: dict) -> vectors aligned with batch_docs
+    write:   fn(batch_docs: dict, vectors) -> DB writer + index builder
+    preview: extract only the cheap first tier (see extract_document)
+    until:   fn() -> True to stop taking new files; files already being extracted still finish
+    failed:  list collecting the paths whose extraction raised or found the file unreadable
+    Returns the final per-stage stats.
+    """
+    workers = workers or EXTRACT_WORKERS
+    batch_size = batch_size or EMBED_BATCH_SIZE
+
+    stats = PipelineStats(["walk", "extract", "embed", "write"])
+    path_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    # Extracted text is the large item: buffer at most two batches of it
+    doc_queue = queue.Queue(maxsize=batch_size * 2)
+    stop = threading.Event()
+    errors = []
+
+    # 1️⃣ Walker stage
+    def walk():
+        try:
+            for path in paths:
+                if until is not None and until():
+                    break
+                if not _put(path_queue, path, stop):
+                    return
+                stats.add("walk")
+            stats.finish("walk")
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(path_queue, _DONE, stop)
+
+    # 2️⃣ Extraction stage: at most `workers * 2` files in flight
+    submitted = {}  # future -> path
+
+    def extract():
+        def forward(futures):
+            for future in futures:
+                path = submitted.pop(future)
+                try:
+                    doc = future.result()
+                except Exception:
+                    doc = None  # one bad file must not stop the scan
+                if not doc:
+                    if failed is not None:
+                        failed.append(path)
+                    continue
+                for stage, seconds in doc.pop("timings", {}).items():
+                    if stage == "extract":
+                        metrics.observe_extract(doc["extension"], seconds)
+                    elif stage == "preview":
+                        metrics.observe_extract(f"{doc['extension']}:preview", seconds)
+                    else:
+                        metrics.observe(stage, seconds)
+                if _put(doc_queue, doc, stop):
+                    stats.add("extract")
+
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = set()
+                while not stop.is_set():
+                    try:
+                        path = path_queue.get(timeout=0.5)
+                    except queue.Empty:
+                        continue
+                    if path is _DONE:
+                        break
+                    if until is not None and until():
+                        continue  # drain what the walker queued without extracting it
+                    future = pool.submit(extract_document, path, preview)
+                    submitted[future] = path
+                    in_flight.add(future)
+                    if len(in_flight) >= workers * 2:
+                        done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                        forward(done)
+                forward(in_flight)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            _put(doc_queue, _DONE, stop)
+
+    threads = [threading.Thread(target=walk, daemon=True), threading.Thread(target=extract, daemon=True)]
+    for t in threads:
+        t.start()
+
+    # 3️⃣ Embedding + write stages (calling thread)
+    def flush(batch):
+        vectors = embed(batch)
+        stats.add("embed", len(batch))
+        write(batch, vectors)
+        stats.add("write", len(batch))
+        if on_progress:
+            on_progress(stats.snapshot())
+
+    try:
+        batch = {}
+        while True:
+            doc = doc_queue.get()
+            if doc is _DONE:
+                break
+            batch[doc["path"]] = doc
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = {}
+        if batch:
+            flush(batch)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    if errors:
+        raise errors[0]
+    return stats.snapshot()
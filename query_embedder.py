@@ -1,21 +1,26 @@
-from sentence_transformers import SentenceTransformer
 import numpy as np
 from typing import List
 
+from embedder import Embedder, get_embedder, MODEL_NAME
+
 class QueryEmbedder:
     """
     Converts text queries and documents into vector embeddings using a sentence transformer.
     """
 
-    def _init_(self, model_name: str = "all-MiniLM-L6-v2"):
+    def __init__(self, model_name: str = MODEL_NAME):
         """
-        Initialize the embedding model.
+        Initialize the embedding model (loaded lazily on first use).
+        The default model is shared with search and indexing instead of loading another copy.
         
         Args:
             model_name (str): Pretrained model name to load from sentence-transformers.
         """
-        print(f"🔍 Loading embedding model: {model_name}")
-        self.model = SentenceTransformer(model_name)
+        self.embedder = get_embedder() if model_name == MODEL_NAME else Embedder(model_name)
+
+    @property
+    def model(self):
+        return self.embedder.model
 
     def embed_query(self, query: str) -> np.ndarray:
         """
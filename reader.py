@@ -1,4 +1,7 @@
 import os
+import hashlib
+import math
+import time
 from PIL import Image, UnidentifiedImageError
 import pytesseract
 from PyPDF2 import PdfReader
@@ -12,56 +15,145 @@ pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tessera
 IMAGE_EXTENSIONS = [".jpg", ".jpeg", ".png", ".bmp", ".webp", ".gif"]
 CODE_EXTENSIONS = [".py", ".java", ".cpp", ".c", ".js", ".sql"]
 SKIP_PREFIXES = ["~$"]
+HASH_CHUNK_SIZE = 1024 * 1024
 
-def read_file_content(path):
+# Two tiers: a cheap preview (first page / first few KB, no OCR) is indexed first and
+# deepened later by a full extraction, which is capped by these per-extractor budgets.
+# Extractors stream lines / pages / rows and stop at the character cap, so memory stays
+# bounded whatever the file size.
+PREVIEW_CHARS = 8 * 1024
+MAX_CONTENT_CHARS = 2_000_000      # characters kept per file (FTS text and embedding input)
+TEXT_CHUNK_CHARS = 64 * 1024       # txt / code are read in chunks of this size
+PDF_MAX_PAGES = 300
+SHEET_MAX_ROWS = 50_000            # across all worksheets
+OCR_MAX_BYTES = 20 * 1024 * 1024   # bigger images are indexed by name only
+OCR_MAX_PIXELS = 16_000_000        # larger images are downscaled before OCR
+OCR_TIMEOUT_SECONDS = 30
+EXTRACT_TIME_BUDGET = 60           # seconds per file; extraction keeps what it has so far
+
+def file_content_hash(path):
+    """
+    Return a fast hash of the file bytes, used to key the extraction/embedding cache.
+    Return None if the file cannot be read.
+    """
+    try:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    except OSError:
+        return None
+
+def _collect(pieces, limit, sep=""):
+    """Join streamed pieces up to limit characters. Return (text, True if pieces ran out first)."""
+    parts, size = [], 0
+    try:
+        for piece in pieces:
+            if parts:
+                piece = sep + piece
+            if size + len(piece) > limit:
+                parts.append(piece[:limit - size])
+                return "".join(parts), False
+            parts.append(piece)
+            size += len(piece)
+        return "".join(parts), True
+    finally:
+        pieces.close()  # releases the file / workbook right away
+
+def _text_chunks(path):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for chunk in iter(lambda: f.read(TEXT_CHUNK_CHARS), ""):
+            yield chunk
+
+def _pdf_pages(pages, max_pages, deadline):
+    for i in range(min(len(pages), max_pages)):
+        yield pages[i].extract_text() or ""
+        if time.monotonic() > deadline:
+            return
+
+def _docx_paragraphs(path):
+    # python-docx parses the whole document up front; paragraphs are still handed out one by one
+    for p in Document(path).paragraphs:
+        yield p.text
+
+def _sheet_rows(path, deadline):
+    # read_only streams rows from the sheet XML instead of building every cell in memory
+    wb = openpyxl.load_workbook(path, data_only=True, read_only=True)
+    try:
+        rows = 0
+        for sheet in wb:
+            for row in sheet.iter_rows(values_only=True):
+                yield " ".join(str(cell) if cell else "" for cell in row)
+                rows += 1
+                if rows >= SHEET_MAX_ROWS or time.monotonic() > deadline:
+                    return
+    finally:
+        wb.close()
+
+def read_file_content(path, preview=False):
     """
     Read and extract content based on file extension.
     Return None if file is unsupported, corrupted or skipped.
     """
+    return extract_content(path, preview)[0]
+
+def extract_content(path, preview=False):
+    """
+    Return (content, complete).
+    preview=True reads only the first page / first PREVIEW_CHARS and skips OCR; complete is
+    False when the preview left part of the file unread (a full extraction should follow).
+    A full extraction is always complete: the budgets above decide how much it reads.
+    """
+    deadline = time.monotonic() + EXTRACT_TIME_BUDGET
+    limit = PREVIEW_CHARS if preview else MAX_CONTENT_CHARS
     try:
         filename = os.path.basename(path)
         ext = os.path.splitext(path)[1].lower()
 
         # Skip temp/lock files like ~$doc.docx
         if any(filename.startswith(pfx) for pfx in SKIP_PREFIXES):
-            return None
+            return None, True
 
-        if ext == ".txt":
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
+        if ext == ".txt" or ext in CODE_EXTENSIONS:
+            text, done = _collect(_text_chunks(path), limit)
+            return text, not preview or done
 
         elif ext == ".pdf":
-            reader = PdfReader(path)
-            return "\n".join([page.extract_text() or "" for page in reader.pages])
+            pages = PdfReader(path).pages
+            text, done = _collect(_pdf_pages(pages, 1 if preview else PDF_MAX_PAGES, deadline), limit, "\n")
+            return text, not preview or (done and len(pages) <= 1)
 
         elif ext == ".docx":
-            doc = Document(path)
-            return "\n".join([p.text for p in doc.paragraphs])
+            text, done = _collect(_docx_paragraphs(path), limit, "\n")
+            return text, not preview or done
 
         elif ext in (".xlsx", ".xls"):
-            wb = openpyxl.load_workbook(path, data_only=True)
-            content = ""
-            for sheet in wb:
-                for row in sheet.iter_rows(values_only=True):
-                    content += " ".join(str(cell) if cell else "" for cell in row) + "\n"
-            return content
-
-        elif ext in CODE_EXTENSIONS:
-            with open(path, "r", encoding="utf-8", errors="ignore") as f:
-                return f.read()
+            text, done = _collect(_sheet_rows(path, deadline), limit, "\n")
+            return text, not preview or done
 
         elif ext == ".db":
-            return f"[Database File: {os.path.basename(path)}]"
+            return f"[Database File: {os.path.basename(path)}]", True
 
         elif ext in IMAGE_EXTENSIONS:
+            label = f"[Image: {os.path.basename(path)}]"
+            if preview:
+                return label, False  # OCR is left to the full extraction
+            if os.path.getsize(path) > OCR_MAX_BYTES:
+                return label, True
             try:
                 img = Image.open(path)
-                text = pytesseract.image_to_string(img)
-                return f"[Image: {os.path.basename(path)}]\n{text.strip()}"
+                if img.width * img.height > OCR_MAX_PIXELS:
+                    scale = math.sqrt(OCR_MAX_PIXELS / (img.width * img.height))
+                    img = img.resize((int(img.width * scale), int(img.height * scale)))
+                text = pytesseract.image_to_string(img, timeout=OCR_TIMEOUT_SECONDS)
+                return f"{label}\n{text.strip()}", True
             except UnidentifiedImageError:
-                return None
+                return None, True
+            except RuntimeError:
+                return label, True  # OCR timed out
 
     except Exception:
-        return None
+        return None, True
 
-    return None
\ No newline at end of file
+    return None, True
\ No newline at end of file
@@ -1,40 +1,256 @@
 # scanner_fast.py
 import os
-from db import get_all_doc_stats
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
-EXCLUDE_DIRS = {"windows","program files","programdata","appdata",
-                ".git",".venv","__pycache__","node_modules","system volume information"}
-VALID_EXTS = {".txt",".pdf",".docx",".xlsx",".xls",".py",".java",".c",".cpp",".jpg",".jpeg",".png",".db"}
+import metrics
+from config import WALK_WORKERS
+from db import get_all_doc_stats, get_dir_state, get_doc_stats, get_doc_stats_under
+
+# ✅ One set of walk rules for full scans, rescans and file counts
+VALID_EXTS = {
+    ".txt", ".pdf", ".docx", ".xlsx", ".xls", ".db",
+    ".js", ".py", ".java", ".cpp", ".c",
+    ".jpg", ".jpeg", ".png", ".bmp", ".webp"
+}
+EXCLUDED_DIRS = {
+    "windows", "program files", "programdata", ".git", ".venv",
+    "appdata", "system volume information", "$recycle.bin",
+    "node_modules", "__pycache__", ".idea", ".vscode",
+    "site-packages", "lib", "dist", "build", ".mypy_cache"
+}
+PRIORITY_FOLDERS = ["Documents", "Desktop", "Downloads"]  # walked first by full scans (see db.get_folder_category)
+RECENT_WINDOW = 20_000  # full scans index newest files first within windows of this many files
 
 def allowed(path):
+    """Indexable extension and no excluded directory anywhere in the path."""
     p = path.lower()
-    if not any(ext in p for ext in VALID_EXTS):
+    if os.path.splitext(p)[1] not in VALID_EXTS:
         return False
-    return not any(ex in p for ex in EXCLUDE_DIRS)
+    return not any(part in EXCLUDED_DIRS for part in p.split(os.sep))
 
-def stat_walk(roots):
-    result = {}
-    for root in roots:
-        for dirpath, dirnames, filenames in os.walk(root):
-            # prune excluded dirs
-            dirnames[:] = [d for d in dirnames if all(ex not in d.lower() for ex in EXCLUDE_DIRS)]
-            for f in filenames:
-                path = os.path.join(dirpath, f)
-                if not allowed(path): 
-                    continue
+def _list_dir(path):
+    """
+    List one directory: ([(file, size, mtime)], [(subdir, mtime)]).
+    Stats come from the DirEntry (free on Windows, where FindNextFile returns them).
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
                 try:
-                    st = os.stat(path)
-                    result[path] = (st.st_size, st.st_mtime)
-                except FileNotFoundError:
+                    if entry.is_dir(follow_symlinks=False):
+                        if entry.name.lower() not in EXCLUDED_DIRS:
+                            subdirs.append((entry.path, entry.stat(follow_symlinks=False).st_mtime))
+                    elif os.path.splitext(entry.name)[1].lower() in VALID_EXTS and entry.is_file():
+                        st = entry.stat()
+                        files.append((entry.path, st.st_size, st.st_mtime))
+                except OSError:
                     continue
-    return result
+    except OSError:
+        pass  # permission denied / vanished while walking
+    return files, subdirs
+
+def _inside(path, root):
+    try:
+        path, root = os.path.normcase(os.path.abspath(path)), os.path.normcase(os.path.abspath(root))
+        return os.path.commonpath([path, root]) == root
+    except ValueError:
+        return False  # different drives
+
+def priority_roots(roots, home=None):
+    """High-value folders under the home directory that lie inside roots, followed by roots."""
+    home = home or os.path.expanduser("~")
+    first = []
+    for name in PRIORITY_FOLDERS:
+        folder = os.path.join(home, name)
+        if os.path.isdir(folder) and any(_inside(folder, root) for root in roots):
+            first.append(folder)
+    return first + [root for root in roots if root not in first]
+
+def recent_first(files, window=RECENT_WINDOW, roots=()):
+    """
+    Re-order walked (path, size, mtime) tuples newest first, within windows of `window` files.
+    With the roots walk() was given, a window also ends where the walk moves on to the next
+    root, so the priority folders are not mixed with (and held back by) the drives after them.
+    """
+    roots = [os.path.normcase(os.path.join(os.path.abspath(root), "")) for root in roots]
+
+    def root_of(path):
+        path = os.path.normcase(path)
+        return next((i for i, root in enumerate(roots) if path.startswith(root)), None)
+
+    buffer, current = [], None
+    for item in files:
+        if roots:
+            owner = root_of(item[0])
+            if owner != current and buffer:
+                buffer.sort(key=lambda f: f[2], reverse=True)
+                yield from buffer
+                buffer = []
+            current = owner
+        buffer.append(item)
+        if len(buffer) >= window:
+            buffer.sort(key=lambda f: f[2], reverse=True)
+            yield from buffer
+            buffer = []
+    buffer.sort(key=lambda f: f[2], reverse=True)
+    yield from buffer
+
+def walk(roots, known_dirs=None, known_files=None, dirs_out=None, workers=WALK_WORKERS, on_listed=None):
+    """
+    Yield (path, size, mtime) for every indexable file under roots; directories are listed in parallel.
+    Roots are walked one after the other in the given order; a root nested in another one is
+    walked only once (as itself, not as part of the outer root).
+
+    known_dirs:  {dir: (parent, mtime)} saved from an earlier walk. A directory whose mtime is
+                 unchanged had no entries added, removed or renamed, so it is not listed: its
+                 files come from known_files ({dir: [(path, size, mtime)]}) and its subdirectories
+                 from known_dirs. In-place edits do not touch the directory mtime, so only
+                 incremental rescans should pass these.
+    dirs_out:    filled with {dir: (parent, mtime)} for every directory visited.
+    on_listed:   fn(dir, parent, mtime, files, subdirs) called for every directory visited.
+    """
+    known_dirs = known_dirs or {}
+    known_files = known_files or {}
+    children = {}
+    for path, (parent, _) in known_dirs.items():
+        children.setdefault(parent, []).append(path)
+
+    def visit(path, mtime):
+        recorded = known_dirs.get(path)
+        if recorded is None or recorded[1] != mtime:
+            with metrics.timed("walk"):
+                return _list_dir(path)
+        subdirs = []
+        for child in children.get(path, ()):
+            try:
+                subdirs.append((child, os.stat(child).st_mtime))
+            except OSError:
+                continue
+        return known_files.get(path, []), subdirs
+
+    queued = []
+    root_keys = set()
+    for root in roots:
+        if any(part in EXCLUDED_DIRS for part in root.lower().split(os.sep)):
+            continue
+        try:
+            parent = os.path.dirname(os.path.normpath(root))
+            queued.append((root, parent if parent != os.path.normpath(root) else None, os.stat(root).st_mtime))
+            root_keys.add(os.path.normcase(os.path.abspath(root)))
+        except OSError:
+            continue
 
-def compute_changes(roots):
+    pending = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while pending or running or queued:
+            if not (pending or running):
+                pending.append(queued.pop(0))  # the next root starts once the previous one is done
+            # Depth-first (LIFO) keeps the frontier small on wide trees
+            while pending and len(running) < workers * 4:
+                path, parent, mtime = pending.pop()
+                running[pool.submit(visit, path, mtime)] = (path, parent, mtime)
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, parent, mtime = running.pop(future)
+                files, subdirs = future.result()
+                subdirs = [s for s in subdirs if os.path.normcase(os.path.abspath(s[0])) not in root_keys]
+                if dirs_out is not None:
+                    dirs_out[path] = (parent, mtime)
+                if on_listed:
+                    on_listed(path, parent, mtime, files, subdirs)
+                pending.extend((subdir, path, subdir_mtime) for subdir, subdir_mtime in subdirs)
+                yield from files
+
+class ScanFrontier:
+    """
+    Progress of a full scan, saved with every index checkpoint so a restarted scan can resume.
+    A directory is finished once it and its direct subdirectories were listed and every file
+    it yielded was committed; finished directories are not listed again on resume.
+    """
+
+    def __init__(self, saved=None):
+        self._lock = threading.Lock()
+        self._dirs = {}            # dir -> [parent, mtime, files not yet committed, subdirs]
+        self._saved = saved or {}  # {dir: (parent, mtime or None)} left by an interrupted scan
+
+    def walk(self, roots, known_files=None, dirs_out=None):
+        """Like walk(); finished directories of the saved frontier are served from known_files."""
+        def on_listed(path, parent, mtime, files, subdirs):
+            with self._lock:
+                self._dirs[path] = [parent, mtime, len(files), [subdir for subdir, _ in subdirs]]
+        return walk(roots, self._saved, known_files, dirs_out, on_listed=on_listed)
+
+    def committed(self, paths):
+        """Mark files as written to the DB and the index builder (or skipped as already there)."""
+        with self._lock:
+            for path in paths:
+                entry = self._dirs.get(os.path.dirname(path))
+                if entry:
+                    entry[2] -= 1
+
+    def snapshot(self):
+        """{dir: (parent, mtime)}; mtime is None for directories that must be listed again."""
+        with self._lock:
+            return {
+                path: (parent, mtime if pending <= 0 and all(s in self._dirs for s in subdirs) else None)
+                for path, (parent, mtime, pending, subdirs) in self._dirs.items()
+            }
+
+def stat_walk(roots, known_dirs=None, known_files=None, dirs_out=None):
+    """Return {path: (size, mtime)} for every indexable file under roots (see walk)."""
+    return {path: (size, mtime) for path, size, mtime in walk(roots, known_dirs, known_files, dirs_out)}
+
+def compute_changes(roots, incremental=False):
+    """
+    Diff the filesystem against the documents table.
+    incremental: skip listing directories whose mtime is unchanged since the last saved walk.
+    Return (new, modified, deleted, fs_stats, dirs); save dirs with db.save_dir_state
+    once the changes are applied so the next incremental rescan can skip them.
+    """
     db_stats = get_all_doc_stats()    # {path: (size, mtime)}
-    fs_stats = stat_walk(roots)
+    known_dirs = known_files = None
+    if incremental:
+        known_dirs = get_dir_state()
+        known_files = {}
+        for path, (size, mtime) in db_stats.items():
+            known_files.setdefault(os.path.dirname(path), []).append((path, size, mtime))
+
+    dirs = {}
+    fs_stats = stat_walk(roots, known_dirs, known_files, dirs)
 
     new_files = [p for p in fs_stats if p not in db_stats]
     modified_files = [p for p,stat in fs_stats.items() if p in db_stats and db_stats[p] != stat]
     deleted_files = [p for p in db_stats if p not in fs_stats]
 
-    return new_files, modified_files, deleted_files, fs_stats
\ No newline at end of file
+    return new_files, modified_files, deleted_files, fs_stats, dirs
+
+def changes_for_paths(paths):
+    """
+    Resolve watcher event paths (files or folders, existing or gone) into
+    (changed, deleted) document paths by checking them against the documents table.
+    """
+    fs_stats, folders = {}, []
+    for path in paths:
+        if os.path.isdir(path):
+            fs_stats.update(stat_walk([path]))
+            folders.append(path)
+        elif os.path.isfile(path):
+            if allowed(path):
+                try:
+                    st = os.stat(path)
+                    fs_stats[path] = (st.st_size, st.st_mtime)
+                except OSError:
+                    continue
+        else:
+            folders.append(path)  # gone: a deleted file, or a deleted / renamed folder
+
+    db_stats = get_doc_stats(set(paths) | set(fs_stats))
+    for folder in folders:
+        db_stats.update(get_doc_stats_under(folder))
+
+    changed = [p for p, stat in fs_stats.items() if db_stats.get(p) != stat]
+    deleted = [p for p in db_stats if p not in fs_stats and not os.path.isfile(p)]
+    return changed, deleted
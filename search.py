@@ -1,89 +1,402 @@
-import faiss
-import pickle
-import sqlite3
-import numpy as np
-import os
+import re
+import json
+import time
+import secrets
 import datetime  # ✅ for date formatting
+import threading
+from collections import OrderedDict
 
-# ✅ Database & index paths
-DB_PATH = "Aaryan_database.db"
-INDEX_PATH = "Aaryan_store/index.faiss"
-META_PATH = "Aaryan_store/meta.pkl"
+import metrics
+from db import read_connection, has_name_index, get_documents_by_ids
+from index_store import index_holder
 
-def search_documents(query: str, embedder, top_k=5):
-    query_lower = query.strip().lower()
-    results = []
+SEARCH_MODES = ("auto", "keyword", "semantic", "hybrid")
+KEYWORD_MAX_TERMS = 2  # auto mode: queries this short are answered by BM25 alone when it finds hits
+RRF_K = 60             # reciprocal rank fusion constant
+BM25_WEIGHTS = (10.0, 2.0, 1.0)  # documents_fts columns: filename, path, content
+
+# Cursor pagination: the first page fetches PREFETCH_PAGES pages of hits; later pages are
+# served from the cursor until it runs out, then the whole search is re-run twice as deep
+# (recomputing the hits of earlier pages too; only the new ones are appended)
+PAGE_SIZE = 5
+MAX_PAGE_SIZE = 100
+MAX_RESULTS = 1000
+PREFETCH_PAGES = 4
+CURSOR_TTL_SECONDS = 600
+MAX_CURSORS = 256
+FILTER_CACHE_SIZE = 32  # selections of recent filters, per loaded index snapshot
+
+def _format_modified(timestamp):
+    try:
+        return datetime.datetime.fromtimestamp(timestamp).strftime("%d-%b-%Y %H:%M")
+    except Exception:
+        return ""
+
+def _fts_query(query):
+    """Turn free text into a safe FTS5 query: every word quoted, any word may match."""
+    terms = re.findall(r"\w+", query.lower())
+    return " OR ".join(f'"{t}"' for t in terms)
 
-    # 1️⃣ Exact filename match from SQLite
+def _timestamp(value):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
     try:
-        conn = sqlite3.connect(DB_PATH)
+        return datetime.datetime.fromisoformat(str(value)).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}")
+
+def _as_list(value, name):
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(v, str) for v in value):
+        return value
+    raise ValueError(f"{name} must be a string or a list of strings")
+
+def parse_filters(raw):
+    """
+    Validate search filters from a request, or None when nothing is filtered:
+    {"extensions": [".pdf"], "folders": ["Documents"], "modifiedAfter": "2026-01-01", "modifiedBefore": ...}
+    Folders are db.get_folder_category names; dates are ISO strings or epoch seconds.
+    Raise ValueError on malformed filters.
+    """
+    if not raw:
+        return None
+    if not isinstance(raw, dict):
+        raise ValueError("filters must be an object")
+    filters = {
+        "extensions": sorted({"." + str(e).lower().lstrip(".") for e in _as_list(raw.get("extensions"), "extensions")}),
+        "folders": sorted({str(f).strip().capitalize() for f in _as_list(raw.get("folders"), "folders")}),
+        "after": _timestamp(raw["modifiedAfter"]) if raw.get("modifiedAfter") is not None else None,
+        "before": _timestamp(raw["modifiedBefore"]) if raw.get("modifiedBefore") is not None else None,
+    }
+    active = filters["extensions"] or filters["folders"] or filters["after"] is not None or filters["before"] is not None
+    return filters if active else None
+
+def _filter_sql(filters, alias="d"):
+    """(" AND ..." clause, params) restricting documents rows to filters; ("", []) for None."""
+    if not filters:
+        return "", []
+    clauses, params = [], []
+    if filters["extensions"]:
+        clauses.append(f"{alias}.extension IN ({','.join('?' * len(filters['extensions']))})")
+        params += filters["extensions"]
+    if filters["folders"]:
+        clauses.append(f"{alias}.folder IN ({','.join('?' * len(filters['folders']))})")
+        params += filters["folders"]
+    if filters["after"] is not None:
+        clauses.append(f"{alias}.modified >= ?")
+        params.append(filters["after"])
+    if filters["before"] is not None:
+        clauses.append(f"{alias}.modified < ?")
+        params.append(filters["before"])
+    return "".join(" AND " + c for c in clauses), params
+
+_FILTER_CACHE = OrderedDict()  # filters -> (path table, sorted ids, IDSelector)
+_FILTER_CACHE_LOCK = threading.Lock()
+
+def _filter_selection(filters, all_paths):
+    """
+    (ids, selector) for filters: the sorted documents.id array matching them (resolved through
+    the filter indexes) that is also in the index snapshot of all_paths, and a faiss IDSelector
+    over it. Cached per snapshot, so repeated filters and paging skip the SQL, the
+    intersection and building the selector.
+    """
+    import faiss
+    import numpy as np
+
+    key = json.dumps(filters)
+    with _FILTER_CACHE_LOCK:
+        cached = _FILTER_CACHE.get(key)
+        if cached is not None and cached[0] is all_paths:
+            _FILTER_CACHE.move_to_end(key)
+            return cached[1:]
+
+    clause, params = _filter_sql(filters)
+    with read_connection() as conn:
+        cur = conn.execute(f"SELECT d.id FROM documents d WHERE 1{clause} ORDER BY d.id", params)
+        ids = np.fromiter((row[0] for row in cur), dtype="int64")
+    known = all_paths.ids if hasattr(all_paths, "ids") else np.fromiter(all_paths.keys(), dtype="int64")
+    ids = np.intersect1d(ids, known)
+    selector = faiss.IDSelectorBatch(ids) if len(ids) else None
+    with _FILTER_CACHE_LOCK:
+        _FILTER_CACHE[key] = (all_paths, ids, selector)
+        while len(_FILTER_CACHE) > FILTER_CACHE_SIZE:
+            _FILTER_CACHE.popitem(last=False)
+    return ids, selector
+
+# 1️⃣ Exact filename match from SQLite
+def _filename_matches(query_lower, top_k, filters=None):
+    clause, params = _filter_sql(filters)
+    with read_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute("""
-            SELECT filename, path, modified, extension
-            FROM documents
-            WHERE lower(filename) LIKE ?
-            ORDER BY modified DESC
-            LIMIT ?
-        """, (f"%{query_lower}%", top_k))
+        if len(query_lower) >= 3 and has_name_index(conn):
+            # Substring lookup through the trigram index; the query is one quoted phrase,
+            # so "_" and "%" are literal characters here
+            phrase = '"' + query_lower.replace('"', '""') + '"'
+            cursor.execute(f"""
+                SELECT d.filename, d.path, d.modified, d.extension
+                FROM documents_name
+                JOIN documents d ON d.id = documents_name.rowid
+                WHERE documents_name MATCH ?{clause}
+                ORDER BY d.modified DESC
+                LIMIT ?
+            """, (phrase, *params, top_k))
+        else:
+            # Trigrams need 3+ characters: short queries fall back to a scan
+            cursor.execute(f"""
+                SELECT d.filename, d.path, d.modified, d.extension
+                FROM documents d
+                WHERE lower(d.filename) LIKE ?{clause}
+                ORDER BY d.modified DESC
+                LIMIT ?
+            """, (f"%{query_lower}%", *params, top_k))
         exact_matches = cursor.fetchall()
-        conn.close()
-
-        for row in exact_matches:
-            try:
-                mod_readable = datetime.datetime.fromtimestamp(row[2]).strftime("%d-%b-%Y %H:%M")
-            except Exception:
-                mod_readable = ""
-            extension = row[3] if row[3] else "unknown"
-
-            results.append({
-                "filename": row[0],
-                "path": row[1],
-                "modified": mod_readable,
-                "extension": extension,
-                "source": "filename match"
-            })
-
-        # 2️⃣ Return early if exact matches found
-        if results:
-            return results
-
-    except Exception as e:
-        print("❌ SQLite filename match failed:", str(e))
-
-    # 3️⃣ Semantic match using FAISS
+
+    return [{
+        "filename": row[0],
+        "path": row[1],
+        "modified": _format_modified(row[2]),
+        "extension": row[3] if row[3] else "unknown",
+        "source": "filename match"
+    } for row in exact_matches]
+
+# 2️⃣ Full-text match from documents_fts, ranked by BM25 (no embedding model involved)
+def _keyword_matches(query, top_k, filters=None):
+    fts_query = _fts_query(query)
+    if not fts_query:
+        return []
+    clause, params = _filter_sql(filters)
+    with read_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT d.filename, d.path, d.modified, d.extension
+            FROM documents_fts
+            JOIN documents d ON d.id = documents_fts.rowid
+            WHERE documents_fts MATCH ?{clause}
+            ORDER BY bm25(documents_fts, {", ".join(map(str, BM25_WEIGHTS))})
+            LIMIT ?
+        """, (fts_query, *params, top_k)).fetchall()
+
+    return [{
+        "filename": row[0],
+        "path": row[1],
+        "modified": _format_modified(row[2]),
+        "extension": row[3] if row[3] else "unknown",
+        "source": "keyword match"
+    } for row in rows]
+
+# 3️⃣ Semantic match using FAISS
+def _semantic_matches(queries, embedder, top_k, filters=None):
+    """
+    One result list per query: a single forward pass and a single index.search over the query matrix.
+    Filters are pushed into the vector search (index_factory.filtered_search) instead of
+    filtering the top_k hits afterwards.
+    """
+    import faiss  # deferred: keeps server startup fast
+    from index_factory import filtered_search
+
+    with metrics.timed("query_embed", len(queries)):
+        query_embeddings = embedder.embed_texts(queries)
+        faiss.normalize_L2(query_embeddings)
+
+    # Served from memory; only reloaded after a new index generation is published
+    index, all_paths = index_holder.get()
+
+    with metrics.timed("faiss_search", len(queries)):
+        if filters:
+            ids, selector = _filter_selection(filters, all_paths)
+            D, I = filtered_search(index, query_embeddings, top_k, ids, selector)
+        else:
+            D, I = index.search(query_embeddings, top_k)
+
+    # Vector ids are documents.id; -1 means no hit. A re-added id can appear twice in
+    # indexes that cannot remove in place (HNSW), and removed ones linger there until the
+    # next rebuild, so only ids of the published snapshot count.
+    hits = [list(dict.fromkeys(int(idx) for idx in row if idx >= 0 and int(idx) in all_paths)) for row in I]
+    # Result fields come from the documents table (one lookup for every query), not the filesystem
+    rows = get_documents_by_ids({doc_id for row in hits for doc_id in row})
+    return [[_semantic_result(rows[doc_id]) for doc_id in row if doc_id in rows] for row in hits]
+
+def _semantic_result(row):
+    filename, path, modified, extension = row
+    return {
+        "filename": filename,
+        "path": path,
+        "modified": _format_modified(modified),
+        "extension": extension if extension else "unknown",
+        "source": "semantic match"
+    }
+
+# 4️⃣ Reciprocal rank fusion of several ranked result lists
+def _fuse_rrf(result_lists, top_k):
+    scores, by_path = {}, {}
+    for results in result_lists:
+        for rank, result in enumerate(results):
+            path = result["path"]
+            scores[path] = scores.get(path, 0.0) + 1.0 / (RRF_K + rank + 1)
+            by_path.setdefault(path, result)
+    ranked = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [dict(by_path[path], source="hybrid match") for path in ranked]
+
+def _lexical_stage(query, top_k, mode, filters=None):
+    """Filename / BM25 stage of one query. Return (results, final); final=False means FAISS is still needed."""
+    query_lower = query.strip().lower()
+
+    if mode == "auto":
+        try:
+            with metrics.timed("filename_search"):
+                results = _filename_matches(query_lower, top_k, filters)
+            # Return early if exact matches found
+            if results:
+                return results, True
+        except Exception as e:
+            print("❌ SQLite filename match failed:", str(e))
+
+    keyword_results = []
+    if mode != "semantic":
+        try:
+            with metrics.timed("keyword_search"):
+                keyword_results = _keyword_matches(query, top_k, filters)
+        except Exception as e:
+            print("❌ FTS keyword match failed:", str(e))
+        if mode == "keyword":
+            return keyword_results, True
+        if mode == "auto" and keyword_results and len(re.findall(r"\w+", query_lower)) <= KEYWORD_MAX_TERMS:
+            return keyword_results, True
+    return keyword_results, False
+
+def search_documents(query: str, embedder, top_k=5, mode="auto", filters=None):
+    """
+    mode: "auto"     filename match, then BM25 for short queries, else hybrid
+          "keyword"  BM25 over documents_fts only (never touches the embedding model)
+          "semantic" FAISS only
+          "hybrid"   BM25 and FAISS rankings fused with reciprocal rank fusion
+    filters: from parse_filters; applied inside every stage, so top_k hits all match
+    """
+    return search_batch([query], embedder, top_k, mode, filters)[0]
+
+def search_batch(queries, embedder, top_k=5, mode="auto", filters=None):
+    """
+    Like search_documents for many queries at once, one result list per query. Queries that
+    need FAISS are embedded in one forward pass and searched with one index.search call.
+    """
+    mode = mode if mode in SEARCH_MODES else "auto"
+    staged = [_lexical_stage(query, top_k, mode, filters) for query in queries]
+
+    pending = [i for i, (_, final) in enumerate(staged) if not final]
+    semantic = {}
+    if pending:
+        try:
+            semantic = dict(zip(pending, _semantic_matches([queries[i] for i in pending], embedder, top_k, filters)))
+        except Exception as e:
+            print("❌ Semantic search failed:", str(e))
+
+    results = []
+    for i, (keyword_results, final) in enumerate(staged):
+        if final or i not in semantic:
+            results.append(keyword_results)
+        elif mode == "semantic" or not keyword_results:
+            results.append(semantic[i])
+        else:
+            results.append(_fuse_rrf([keyword_results, semantic[i]], top_k))
+    return results
+
+# 5️⃣ Cursor pagination: ranked hits stay on the server, pages are slices of them
+_CURSORS = OrderedDict()  # cursor -> {"query", "mode", "filters", "results", "offset", "depth", "expires"}
+_CURSORS_LOCK = threading.Lock()
+
+def _page_size(limit):
     try:
-        query_embedding = embedder.embed_texts([query])
-        faiss.normalize_L2(query_embedding)
-
-        index = faiss.read_index(INDEX_PATH)
-        with open(META_PATH, "rb") as f:
-            all_paths = pickle.load(f)
-
-        D, I = index.search(query_embedding, top_k)
-
-        for idx in I[0]:
-            if idx < len(all_paths):
-                path = all_paths[idx]
-                try:
-                    mod_time = os.path.getmtime(path)
-                    mod_readable = datetime.datetime.fromtimestamp(mod_time).strftime("%d-%b-%Y %H:%M")
-                except Exception:
-                    mod_readable = ""
-
-                # ✅ Clean extension extraction
-                ext = os.path.splitext(path)[1].lower()
-                extension = ext if ext else "unknown"
-
-                results.append({
-                    "filename": os.path.basename(path),
-                    "path": path,
-                    "modified": mod_readable,
-                    "extension": extension,
-                    "source": "semantic match"
-                })
-
-        return results
-
-    except Exception as e:
-        print("❌ Semantic search failed:", str(e))
+        return min(max(int(limit), 1), MAX_PAGE_SIZE)
+    except (TypeError, ValueError):
+        return PAGE_SIZE
+
+def _take_page(state, limit):
+    page = state["results"][state["offset"]:state["offset"] + limit]
+    state["offset"] += len(page)
+    more = state["offset"] < len(state["results"]) or state["depth"] is not None
+    return page, more
+
+def _deepen(states, embedder):
+    """
+    Re-run the searches of cursors that ran out twice as deep, keeping the hits already fetched first.
+    The deeper search ranks the earlier pages' hits again; they are only dropped from its result.
+    """
+    groups = {}
+    for state in states:
+        groups.setdefault((state["mode"], json.dumps(state["filters"])), []).append(state)
+    for group in groups.values():
+        mode, filters = group[0]["mode"], group[0]["filters"]
+        depth = max(state["depth"] for state in group) * 2
+        for state, results in zip(group, search_batch([s["query"] for s in group], embedder, depth, mode, filters)):
+            seen = {r["path"] for r in state["results"]}
+            fresh = [r for r in results if r["path"] not in seen]
+            state["results"] += fresh
+            # A short or unchanged ranking means the search has nothing more to give
+            state["depth"] = depth if fresh and len(results) >= depth and depth < MAX_RESULTS else None
+
+def parse_queries(raw):
+    """Validate the queries of a first-page request: a list of non-empty strings (None: no queries)."""
+    if raw is None:
         return []
+    if isinstance(raw, list) and all(isinstance(q, str) and q.strip() for q in raw):
+        return [q.strip() for q in raw]
+    raise ValueError("queries must be a list of non-empty strings")
+
+def parse_cursors(raw):
+    """
+    Validate the cursors of a next-page request: None (first pages) or a list of cursors as
+    returned earlier, strings or nulls. Raise ValueError otherwise.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, list) and all(c is None or isinstance(c, str) for c in raw):
+        return raw
+    raise ValueError("cursors must be a list of strings or nulls")
+
+def search_pages(queries, embedder, limit=PAGE_SIZE, mode="auto", cursors=None, filters=None):
+    """
+    First pages for queries (one batched search), or next pages for cursors returned earlier
+    (which keep the mode and filters of their first page).
+    Return [{"query", "results", "cursor"}] in request order; cursor is None on the last page
+    and "expired" for unknown / timed-out cursors. A null cursor (a finished query) gets an
+    empty last page. Raise ValueError on malformed queries or cursors (see parse_queries / parse_cursors).
+    """
+    cursors = parse_cursors(cursors)
+    queries = parse_queries(queries) if cursors is None else []
+    limit = _page_size(limit)
+    mode = mode if mode in SEARCH_MODES else "auto"
+    now = time.monotonic()
+    with _CURSORS_LOCK:
+        for token in [t for t, s in _CURSORS.items() if s["expires"] < now]:
+            del _CURSORS[token]
+
+    if cursors is None:
+        depth = min(limit * PREFETCH_PAGES, MAX_RESULTS)
+        states = [
+            {"query": query, "mode": mode, "filters": filters, "results": results, "offset": 0,
+             "depth": depth if len(results) >= depth and depth < MAX_RESULTS else None}
+            for query, results in zip(queries, search_batch(queries, embedder, depth, mode, filters))
+        ]
+        tokens = [secrets.token_urlsafe(12) for _ in states]
+    else:
+        tokens = list(cursors)
+        with _CURSORS_LOCK:
+            states = [_CURSORS.pop(token, None) if token is not None else None for token in tokens]
+        _deepen([s for s in states if s and s["depth"] is not None and s["offset"] + limit > len(s["results"])], embedder)
+
+    pages = []
+    for token, state in zip(tokens, states):
+        if state is None:
+            pages.append({"query": None, "results": [], "cursor": "expired" if token is not None else None})
+            continue
+        page, more = _take_page(state, limit)
+        pages.append({"query": state["query"], "results": page, "cursor": token if more else None})
+        if more:
+            state["expires"] = now + CURSOR_TTL_SECONDS
+            with _CURSORS_LOCK:
+                _CURSORS[token] = state
+                while len(_CURSORS) > MAX_CURSORS:
+                    _CURSORS.popitem(last=False)
+    return pages
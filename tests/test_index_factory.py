@@ -0,0 +1,55 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+faiss = pytest.importorskip("faiss")
+
+import index_factory
+
+
+def _vectors(n=2000, d=16, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, d)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def test_configure_search_sets_rerank_k_factor(monkeypatch):
+    monkeypatch.setattr(index_factory, "INDEX_RERANK_K_FACTOR", 4)
+    vectors = _vectors()
+    index = index_factory._new_index("ivf+rerank", len(vectors), vectors.shape[1])
+    index.train(vectors)
+    index.add_with_ids(vectors, np.arange(len(vectors), dtype="int64"))
+
+    index_factory.configure_search(index)
+
+    refine = faiss.downcast_index(index.index)
+    assert isinstance(refine, faiss.IndexRefine)
+    assert refine.k_factor == 4
+
+
+def test_recall_report_covers_rerank_rows():
+    rows = index_factory.recall_report(_vectors(), types=("ivf",))
+    assert [row["type"] for row in rows] == ["ivf", "ivf+rerank"]
+
+
+def _exact_top(vectors, ids, allowed, queries, k):
+    scores = queries @ vectors[np.searchsorted(ids, allowed)].T
+    return allowed[np.argsort(-scores, axis=1)[:, :k]]
+
+
+@pytest.mark.parametrize("index_type", ["flat", "hnsw", "hnsw+rerank"])
+@pytest.mark.parametrize("exact_max", [0, 1_000_000])
+def test_filtered_search_stays_inside_selection(monkeypatch, index_type, exact_max):
+    monkeypatch.setattr(index_factory, "INDEX_RERANK_K_FACTOR", 8)
+    monkeypatch.setattr(index_factory, "FILTER_EXACT_MAX", exact_max)
+    vectors = _vectors(3000)
+    ids = np.arange(100, 3100, dtype="int64")
+    index = index_factory._new_index(index_type, len(vectors), vectors.shape[1])
+    index.add_with_ids(vectors, ids)
+    index_factory.configure_search(index)
+    allowed = ids[::3]
+
+    _, found = index_factory.filtered_search(index, vectors[:5], 10, allowed)
+
+    assert np.isin(found, allowed).all()
+    recall = np.mean([len(set(f) & set(t)) / 10 for f, t in zip(found, _exact_top(vectors, ids, allowed, vectors[:5], 10))])
+    assert recall >= 0.9
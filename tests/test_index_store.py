@@ -0,0 +1,22 @@
+import pickle
+
+import index_store
+
+
+def _legacy_store(monkeypatch, tmp_path, meta):
+    monkeypatch.setattr(index_store, "CURRENT_PATH", str(tmp_path / "CURRENT"))
+    monkeypatch.setattr(index_store, "VERSION_PATH", str(tmp_path / "version"))
+    monkeypatch.setattr(index_store, "INDEX_PATH", str(tmp_path / "index.faiss"))
+    monkeypatch.setattr(index_store, "META_PATH", str(tmp_path / "meta.pkl"))
+    (tmp_path / "index.faiss").write_bytes(b"")
+    (tmp_path / "meta.pkl").write_bytes(pickle.dumps(meta))
+
+
+def test_legacy_positional_index_counts_as_missing(monkeypatch, tmp_path):
+    _legacy_store(monkeypatch, tmp_path, ["C:\\a.txt", "C:\\b.txt"])
+    assert not index_store.index_exists()
+
+
+def test_legacy_id_keyed_index_is_used(monkeypatch, tmp_path):
+    _legacy_store(monkeypatch, tmp_path, {7: "C:\\a.txt"})
+    assert index_store.generation_paths() == (index_store.INDEX_PATH, index_store.META_PATH)
@@ -0,0 +1,24 @@
+import os
+
+from scanner_fast import priority_roots, recent_first, walk
+
+
+def _touch(path, mtime):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, "w").close()
+    os.utime(path, (mtime, mtime))
+
+
+def test_priority_folders_come_first_even_when_older(tmp_path):
+    home, drive = tmp_path / "home", tmp_path
+    for i in range(5):
+        _touch(str(home / "Documents" / f"old{i}.txt"), 1_000 + i)
+    for i in range(50):
+        _touch(str(drive / "data" / f"sub{i % 7}" / f"new{i}.txt"), 2_000 + i)
+
+    roots = priority_roots([str(drive)], home=str(home))
+    order = [path for path, _, _ in recent_first(walk(roots), roots=roots)]
+
+    assert len(order) == 55
+    assert all("Documents" in path for path in order[:5])
+    assert [os.path.basename(p) for p in order[5:8]] == ["new49.txt", "new48.txt", "new47.txt"]
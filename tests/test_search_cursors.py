@@ -0,0 +1,26 @@
+import pytest
+
+from search import parse_cursors, parse_queries, search_pages
+
+
+def test_parse_cursors_accepts_strings_and_nulls():
+    assert parse_cursors(None) is None
+    assert parse_cursors(["abc", None]) == ["abc", None]
+
+
+@pytest.mark.parametrize("raw", ["abc", [1], [["abc"]], {"abc": 1}])
+def test_parse_cursors_rejects_malformed_cursors(raw):
+    with pytest.raises(ValueError):
+        parse_cursors(raw)
+
+
+@pytest.mark.parametrize("raw", ["invoice", [""], ["  "], [{"q": 1}], [3], {"q": "invoice"}])
+def test_parse_queries_rejects_anything_but_non_empty_strings(raw):
+    with pytest.raises(ValueError):
+        parse_queries(raw)
+
+
+def test_search_pages_answers_null_and_unknown_cursors():
+    pages = search_pages([], None, cursors=[None, "unknown"])
+    assert [page["cursor"] for page in pages] == [None, "expired"]
+    assert all(page["results"] == [] for page in pages)
@@ -0,0 +1,25 @@
+import pytest
+
+from search import parse_filters
+
+
+def test_parse_filters_normalizes_values():
+    filters = parse_filters({"extensions": ["PDF", ".docx"], "folders": "documents", "modifiedAfter": 0})
+    assert filters == {"extensions": [".docx", ".pdf"], "folders": ["Documents"], "after": 0.0, "before": None}
+
+
+def test_parse_filters_without_values_is_none():
+    assert parse_filters({}) is None
+    assert parse_filters({"extensions": []}) is None
+
+
+@pytest.mark.parametrize("raw", [
+    {"extensions": 5},
+    {"folders": {"a": 1}},
+    {"extensions": [".pdf", 3]},
+    {"modifiedAfter": "not a date"},
+    ["extensions"],
+])
+def test_parse_filters_rejects_malformed_filters(raw):
+    with pytest.raises(ValueError):
+        parse_filters(raw)